@@ -0,0 +1,369 @@
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import String, and_, bindparam, case, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from . import investidores, stats, versao
+from .llm_csv import is_placeholder
+from .models import Startup
+from .valores import parse_valores
+
+BATCH_SIZE = 1000
+
+# Colunas que podem vir do upstream (tudo menos id)
+UPSERT_COLUMNS = [c.name for c in Startup.__table__.columns if c.name != "id"]
+
+# Campos de conteúdo que entram no hash de mudança (sem colunas derivadas/controle)
+HASH_COLUMNS = [
+    "nome", "site", "setor", "ano_fundacao", "valor_investimento", "rodada", "data_investimento",
+    "vc_investidor", "descricao_breve", "linkedin_fundador", "localizacao",
+]
+
+
+def _comparable(value):
+    if is_placeholder(value):
+        # 'Desconhecido' e None contam como o mesmo conteúdo
+        return None
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def row_hash(row):
+    content = json.dumps([_comparable(row.get(c)) for c in HASH_COLUMNS], ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _dedupe(items):
+    """Mantém uma linha por nome; ON CONFLICT não aceita o mesmo alvo duas vezes no lote"""
+    merged = {}
+    for it in items:
+        nome = it.get("nome")
+        if not nome:
+            continue
+        # 'Desconhecido' e afins viram None: placeholder nunca sobrescreve dado real
+        # (COALESCE no upsert, colunas alteradas e hash tratam os dois igual)
+        row = {
+            k: None if k != "nome" and is_placeholder(v) else v
+            for k, v in it.items() if k in UPSERT_COLUMNS
+        }
+        if nome in merged:
+            # valores não nulos posteriores vencem, como no fluxo antigo linha a linha
+            merged[nome].update({k: v for k, v in row.items() if v is not None})
+        else:
+            merged[nome] = row
+    # ordem por nome: as travas de lock_startups são sempre pegas na mesma ordem
+    return sorted(merged.values(), key=lambda r: r["nome"])
+
+
+# Namespace das advisory locks de startups (primeiro argumento de pg_advisory_xact_lock)
+STARTUP_LOCK_CLASS = 7301
+
+
+def lock_startups(session, nomes):
+    """Trava os nomes do lote até o fim da transação (Postgres).
+
+    Escritores concorrentes da mesma startup (POST, worker de enriquecimento,
+    ETL) calculam o delta de startup_stats a partir do estado lido depois da
+    trava, não de um pré-estado compartilhado. A trava é por nome, então
+    também cobre startups que ainda não existem. No SQLite a escrita já é
+    serializada pelo próprio banco.
+    """
+    if not nomes or session.get_bind().dialect.name != "postgresql":
+        return
+    batch = func.unnest(bindparam("nomes", type_=postgresql.ARRAY(String))).table_valued("nome")
+    session.execute(
+        select(func.pg_advisory_xact_lock(STARTUP_LOCK_CLASS, func.hashtext(batch.c.nome))).order_by(batch.c.nome),
+        {"nomes": sorted(nomes)},
+    )
+
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _on_conflict_upsert(session, insert_fn, rows):
+    table = Startup.__table__
+    stmt = insert_fn(table).values(rows)
+    # COALESCE: NULL vindo do upstream não apaga o valor que já existe
+    set_ = {
+        col: func.coalesce(stmt.excluded[col], table.c[col])
+        for col in UPSERT_COLUMNS if col != "nome"
+    }
+    # O valor numérico acompanha o texto: texto novo (mesmo não interpretável) substitui o número
+    set_["valor_investimento_brl"] = case(
+        (stmt.excluded.valor_investimento.is_(None), table.c.valor_investimento_brl),
+        else_=stmt.excluded.valor_investimento_brl,
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.nome], set_=set_).returning(*table.c)
+    return [dict(r._mapping) for r in session.execute(stmt)]
+
+
+def _generic_upsert(session, rows):
+    # Fallback para dialetos sem ON CONFLICT: um SELECT ... IN + INSERT/UPDATE em lote
+    table = Startup.__table__
+    nomes = [r["nome"] for r in rows]
+    existing = {r.nome: r for r in session.execute(select(table).where(table.c.nome.in_(nomes)))}
+    inserts, updates = [], []
+    for r in rows:
+        old = existing.get(r["nome"])
+        if old is None:
+            inserts.append(r)
+        else:
+            merged = {"b_" + k: (v if v is not None else getattr(old, k)) for k, v in r.items()}
+            if r.get("valor_investimento") is not None:
+                merged["b_valor_investimento_brl"] = r.get("valor_investimento_brl")
+            merged["b_id"] = old.id
+            updates.append(merged)
+    if inserts:
+        session.execute(table.insert(), inserts)
+    if updates:
+        cols = {k[2:]: bindparam(k) for k in updates[0] if k != "b_id"}
+        session.execute(table.update().where(table.c.id == bindparam("b_id")).values(cols), updates)
+    return [dict(r._mapping) for r in session.execute(select(table).where(table.c.nome.in_(nomes)))]
+
+
+def bulk_upsert_startups(session, items, commit=True):
+    """Upsert em lote por `nome`, um comando por bloco de BATCH_SIZE linhas.
+
+    Retorna as linhas afetadas como dicionários. Campos None nas entradas
+    preservam o valor atual no banco; `conteudo_hash`, se vier, é mantido.
+    """
+    now = datetime.utcnow()
+    rows = _dedupe(items)
+    valores = parse_valores([r.get("valor_investimento") for r in rows])
+    for r, valor in zip(rows, valores):
+        r["atualizado_em"] = now
+        r["valor_investimento_brl"] = valor
+        # hash pré-calculado: quem grava só parte das colunas (enriquecimento) passa o do estado final
+        r["conteudo_hash"] = r.get("conteudo_hash") or row_hash(r)
+        for col in UPSERT_COLUMNS:
+            r.setdefault(col, None)
+
+    dialect = session.get_bind().dialect.name
+    result = []
+    for chunk in _chunks(rows, BATCH_SIZE):
+        lock_startups(session, [r["nome"] for r in chunk])
+        old = stats.fetch_current(session, [r["nome"] for r in chunk])
+        if dialect == "postgresql":
+            affected = _on_conflict_upsert(session, postgresql.insert, chunk)
+        elif dialect == "sqlite":
+            affected = _on_conflict_upsert(session, sqlite.insert, chunk)
+        else:
+            affected = _generic_upsert(session, chunk)
+        # Agregados do dashboard acompanham o upsert na mesma transação
+        stats.apply_delta(session, old, affected)
+        investidores.sync_links(session, affected)
+        result.extend(affected)
+    if rows:
+        # invalida ETags e o cache de respostas da API
+        versao.bump(session, now)
+    if commit:
+        session.commit()
+    return result
+
+
+
+def upsert_changed_startups(session, items, commit=True):
+    """Variante incremental do upsert, usada pelo ETL.
+
+    Compara o hash de conteúdo de cada linha com o gravado: linhas iguais não
+    são tocadas (nem atualizado_em), linhas alteradas só têm as colunas que
+    mudaram reescritas. Retorna a contagem de inserted/updated/unchanged.
+    """
+    table = Startup.__table__
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    rows = _dedupe(items)
+    for r, valor in zip(rows, parse_valores([r.get("valor_investimento") for r in rows])):
+        r["valor_investimento_brl"] = valor
+        r["conteudo_hash"] = row_hash(r)
+
+    for chunk in _chunks(rows, BATCH_SIZE):
+        nomes = [r["nome"] for r in chunk]
+        lock_startups(session, nomes)
+        existing = {
+            r["nome"]: r for r in
+            (dict(m._mapping) for m in session.execute(select(table).where(table.c.nome.in_(nomes))))
+        }
+        new_rows, old_changed, groups = [], [], {}
+        for r in chunk:
+            old = existing.get(r["nome"])
+            if old is None:
+                new_rows.append(r)
+                continue
+            if old["conteudo_hash"] == r["conteudo_hash"]:
+                counts["unchanged"] += 1
+                continue
+            # Só colunas com valor novo e diferente; None continua preservando o atual
+            changed = {
+                k: v for k, v in r.items()
+                if k != "nome" and v is not None and _comparable(v) != _comparable(old.get(k))
+            }
+            if r.get("valor_investimento") is not None and old.get("valor_investimento_brl") != r["valor_investimento_brl"]:
+                changed["valor_investimento_brl"] = r["valor_investimento_brl"]
+            # mesmo sem coluna alterada o hash é gravado, para não comparar de novo no próximo run
+            changed["conteudo_hash"] = r["conteudo_hash"]
+            old_changed.append(old)
+            groups.setdefault(tuple(sorted(changed)), []).append({"b_id": old["id"], **{"b_" + k: v for k, v in changed.items()}})
+            counts["updated"] += 1
+
+        if new_rows:
+            bulk_upsert_startups(session, new_rows, commit=False)
+            counts["inserted"] += len(new_rows)
+        now = datetime.utcnow()
+        for cols, params in groups.items():
+            # Um UPDATE executemany por combinação de colunas alteradas
+            values = {c: bindparam("b_" + c) for c in cols}
+            values["atualizado_em"] = now
+            session.execute(table.update().where(table.c.id == bindparam("b_id")).values(values), params)
+        if groups:
+            versao.bump(session, now)
+        if old_changed:
+            ids = [o["id"] for o in old_changed]
+            updated_rows = [dict(m._mapping) for m in session.execute(select(table).where(table.c.id.in_(ids)))]
+            stats.apply_delta(session, old_changed, updated_rows)
+            # vínculos só mudam quando vc_investidor mudou
+            old_vcs = {o["id"]: o["vc_investidor"] for o in old_changed}
+            investidores.sync_links(session, [r for r in updated_rows if r["vc_investidor"] != old_vcs[r["id"]]])
+    if commit:
+        session.commit()
+    return counts
+
+# Colunas aceitas em `sort=` e em `fields=` no GET /api/startups
+SORT_COLUMNS = ["id", "nome", "setor", "localizacao", "rodada", "ano_fundacao", "data_investimento", "atualizado_em", "valor_investimento_brl"]
+FIELD_COLUMNS = [c.name for c in Startup.__table__.columns]
+
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, (date, datetime)):
+        sort_value = sort_value.isoformat()
+    elif isinstance(sort_value, Decimal):
+        sort_value = str(sort_value)
+    raw = json.dumps([sort_value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor, column):
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if sort_value is not None:
+            python_type = column.type.python_type
+            if python_type is datetime:
+                sort_value = datetime.fromisoformat(sort_value)
+            elif python_type is date:
+                sort_value = date.fromisoformat(sort_value)
+            else:
+                sort_value = python_type(sort_value)
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError("cursor inválido")
+
+
+def _keyset_condition(col, id_col, value, row_id, desc):
+    """Predicado do cursor que vira range no índice (col, id), sem OR"""
+    if col is id_col:
+        return id_col < row_id if desc else id_col > row_id
+    if value is None:
+        # cursor já na cauda de NULLs
+        return and_(col.is_(None), id_col < row_id if desc else id_col > row_id)
+    key, after = tuple_(col, id_col), tuple_(value, row_id)
+    return key < after if desc else key > after
+
+
+def resolve_fields(fields):
+    """Valida `fields=`; sem projeção, todas as colunas. `id` sempre incluído"""
+    if not fields:
+        return FIELD_COLUMNS
+    unknown = [f for f in fields if f not in FIELD_COLUMNS]
+    if unknown:
+        raise ValueError(f"fields inválidos: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", *fields]))
+
+
+def apply_filters(stmt, filters):
+    """Filtros compartilhados pela listagem e pela exportação"""
+    table = Startup.__table__
+    for col in ("setor", "localizacao", "rodada"):
+        if filters.get(col):
+            stmt = stmt.where(table.c[col] == filters[col])
+    if filters.get("vc_investidor"):
+        # nome exato do investidor, via startup_investidores
+        stmt = stmt.where(investidores.has_investidor(filters["vc_investidor"]))
+    if filters.get("data_de"):
+        stmt = stmt.where(table.c.data_investimento >= filters["data_de"])
+    if filters.get("data_ate"):
+        stmt = stmt.where(table.c.data_investimento <= filters["data_ate"])
+    if filters.get("valor_min") is not None:
+        stmt = stmt.where(table.c.valor_investimento_brl >= filters["valor_min"])
+    if filters.get("valor_max") is not None:
+        stmt = stmt.where(table.c.valor_investimento_brl <= filters["valor_max"])
+    return stmt
+
+
+def _fetch_rows(session, stmt):
+    result = session.execute(stmt)
+    keys = list(result.keys())
+    # tuplas -> dict direto, sem passar pelo RowMapping de cada linha
+    return [dict(zip(keys, r)) for r in result]
+
+
+def list_startups(session, filters=None, sort="id", desc=False, cursor=None, limit=100, fields=None, skip=0):
+    """Lista startups com filtros, ordenação e paginação por cursor sobre (sort, id).
+
+    Retorna (linhas, próximo cursor ou None). `fields` limita as colunas
+    selecionadas; `id` sempre vem junto porque compõe o cursor.
+    """
+    table = Startup.__table__
+    filters = filters or {}
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"sort inválido: {sort}")
+    sort_col = table.c[sort]
+
+    names = resolve_fields(fields)
+    selected = [table.c[n] for n in names]
+    if sort not in names:
+        selected.append(sort_col)
+
+    stmt = apply_filters(select(*selected), filters)
+    id_order = table.c.id.desc() if desc else table.c.id.asc()
+    sort_order = sort_col.desc() if desc else sort_col.asc()
+    value, row_id = decode_cursor(cursor, sort_col) if cursor else (None, None)
+
+    if sort == "id" or (skip and not cursor):
+        # sort=id, ou OFFSET legado: uma consulta só
+        if cursor:
+            stmt = stmt.where(_keyset_condition(sort_col, table.c.id, value, row_id, desc))
+        elif skip:
+            stmt = stmt.offset(skip)
+        order = [id_order] if sort == "id" else [sort_order.nulls_last(), id_order]
+        rows = _fetch_rows(session, stmt.order_by(*order).limit(limit + 1))
+    else:
+        # NULLs ficam sempre no fim, em qualquer direção. Valores e cauda de NULLs
+        # são consultados separados para que ambos sejam seeks no índice (col, id),
+        # também no desc (varredura reversa, sem NULLS LAST no ORDER BY)
+        rows = []
+        if not cursor or value is not None:
+            head = stmt.where(sort_col.is_not(None))
+            if cursor:
+                head = head.where(_keyset_condition(sort_col, table.c.id, value, row_id, desc))
+            rows = _fetch_rows(session, head.order_by(sort_order, id_order).limit(limit + 1))
+        if len(rows) <= limit:
+            tail = stmt.where(sort_col.is_(None))
+            if cursor and value is None:
+                tail = tail.where(_keyset_condition(sort_col, table.c.id, None, row_id, desc))
+            rows += _fetch_rows(session, tail.order_by(id_order).limit(limit + 1 - len(rows)))
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort], last["id"])
+    if sort not in names:
+        for r in rows:
+            r.pop(sort, None)
+    return rows, next_cursor
@@ -1,5 +1,10 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
@@ -20,13 +25,133 @@ DATABASE_URL = _clean_db_url(os.getenv("DATABASE_URL"))
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set. Please add it to your .env file or environment variables.")
 
-# Create engine with clearer errors
+# Pool settings (override via .env)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# pre-ping costs a round trip per checkout; recycle already drops stale connections
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# checkouts slower than this count as a wait for a free connection
+DB_POOL_WAIT_THRESHOLD = float(os.getenv("DB_POOL_WAIT_THRESHOLD", "0.005"))
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def _async_url(url):
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver configured for {parsed.get_backend_name()}")
+    return parsed.set(drivername=driver)
+
+
+def _engine_kwargs(url, is_async=False):
+    backend = make_url(url).get_backend_name()
+    kwargs = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if backend == "sqlite":
+        # SQLite uses its own pools; sizing and statement_timeout don't apply
+        return kwargs
+    kwargs.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    if backend == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return kwargs
+
+
+class PoolStats:
+    """Pool usage counters for one engine (checkouts, waits, overflow)"""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+
+    def record_acquire(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            if seconds >= DB_POOL_WAIT_THRESHOLD:
+                self.waits += 1
+                self.wait_seconds += seconds
+
+    def snapshot(self):
+        pool = self.engine.pool
+        data = {
+            "pool": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "waits": self.waits,
+            "wait_seconds": round(self.wait_seconds, 6),
+            "timeouts": self.timeouts,
+        }
+        for attr in ("size", "checkedout", "checkedin", "overflow"):
+            if hasattr(pool, attr):
+                data[attr] = getattr(pool, attr)()
+        return data
+
+
+# Create engines with clearer errors
 try:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    engine = create_engine(DATABASE_URL, **_engine_kwargs(DATABASE_URL))
+    async_engine = create_async_engine(_async_url(DATABASE_URL), **_engine_kwargs(DATABASE_URL, is_async=True))
 except Exception as e:
     raise RuntimeError(f"Failed to create SQLAlchemy engine from DATABASE_URL: {e}")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+pool_stats = {
+    "sync": PoolStats("sync", engine),
+    "async": PoolStats("async", async_engine.sync_engine),
+}
 
 def get_session():
+    """Plain session for scripts, the ETL and job workers; the caller closes it"""
     return SessionLocal()
+
+async def get_async_session():
+    """FastAPI dependency: yields an AsyncSession and always closes it"""
+    async with AsyncSessionLocal() as session:
+        start = time.perf_counter()
+        try:
+            # checks out the connection up front so pool waits are measured
+            await session.connection()
+        except PoolTimeoutError:
+            pool_stats["async"].record_acquire(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats["async"].record_acquire(time.perf_counter() - start)
+        yield session
+
+def pool_snapshot():
+    return {name: stats.snapshot() for name, stats in pool_stats.items()}
@@ -0,0 +1,206 @@
+import difflib
+import os
+import re
+import time
+import unicodedata
+import httpx
+from sqlalchemy import func, or_, select
+from . import crud, metrics
+from .llm_cache import llm_cache
+from .llm_csv import FIELD_ORDER, UNKNOWN, is_placeholder, parse_startups_csv
+from .models import Startup
+
+# Configuração do enriquecimento em lote (pode ser sobrescrita via .env)
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "20"))  # nomes por prompt
+ENRICH_PROMPT_MAX_CHARS = int(os.getenv("ENRICH_PROMPT_MAX_CHARS", "2000"))  # tamanho da lista de nomes
+ENRICH_MATCH_THRESHOLD = float(os.getenv("ENRICH_MATCH_THRESHOLD", "0.85"))
+
+PERPLEXY_URL = os.getenv("PERPLEXY_URL", "https://api.perplexity.ai/chat/completions")
+
+# Campos que o enriquecimento pode preencher (nome é a chave, nunca muda)
+GAP_FIELDS = [f for f in FIELD_ORDER if f != "nome"]
+
+_SUFFIXES = re.compile(r"\b(ltda|s ?a|inc|llc|ltd|corp|tecnologia|technologies|tech)\b")
+_NON_ALNUM = re.compile(r"[^a-z0-9 ]")
+
+
+def build_payload(names):
+    lista = "\n".join(f"- {n}" for n in names)
+    return {
+        "model": "sonar-pro",
+        "messages": [
+            {"role": "system", "content": "Você é um assistente especializado em fornecer dados estruturados de startups."},
+            {"role": "user", "content": f"""
+        Para cada startup da lista abaixo, retorne uma linha com os dados dela em formato CSV.
+
+        As colunas devem ser exatamente nesta ordem:
+        Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)
+
+        Regras:
+        - Use o nome exatamente como está na lista.
+        - Uma linha por startup da lista, sem acrescentar outras startups.
+        - Se não houver informação sobre um campo, escreva 'Desconhecido'.
+        - Use sempre ponto e vírgula (;) como separador de colunas.
+        - Retorne apenas a tabela em CSV puro, com o cabeçalho, sem markdown e sem comentários.
+
+        Startups:
+{lista}
+        """},
+        ],
+    }
+
+
+def pack(names, batch_size=ENRICH_BATCH_SIZE, max_chars=ENRICH_PROMPT_MAX_CHARS):
+    """Divide os nomes em lotes limitados por quantidade e pelo tamanho da lista no prompt"""
+    batches, current, size = [], [], 0
+    for name in dict.fromkeys(names):
+        line = len(name) + 3
+        if current and (len(current) >= batch_size or size + line > max_chars):
+            batches.append(current)
+            current, size = [], 0
+        current.append(name)
+        size += line
+    if current:
+        batches.append(current)
+    return batches
+
+
+def normalize_name(name):
+    """'Nubank S.A.' -> 'nubank': sem acento, caixa, pontuação e sufixos societários"""
+    name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii").lower()
+    name = _NON_ALNUM.sub(" ", name)
+    return " ".join(_SUFFIXES.sub(" ", name).split())
+
+
+def match_rows(names, rows, threshold=ENRICH_MATCH_THRESHOLD):
+    """Associa cada linha devolvida pelo LLM a um nome pedido: {nome pedido: linha}.
+
+    Primeiro por nome normalizado idêntico, depois pela maior similaridade
+    acima de `threshold`. Cada nome recebe no máximo uma linha.
+    """
+    wanted = {normalize_name(n): n for n in names}
+    matched = {}
+    leftovers = []
+    for row in rows:
+        key = normalize_name(row.get("nome"))
+        name = wanted.get(key)
+        if name is not None and name not in matched:
+            matched[name] = row
+        else:
+            leftovers.append((key, row))
+    for key, row in leftovers:
+        candidates = [(k, n) for k, n in wanted.items() if n not in matched]
+        if not candidates or not key:
+            continue
+        score, name = max((difflib.SequenceMatcher(None, key, k).ratio(), n) for k, n in candidates)
+        if score >= threshold:
+            matched[name] = row
+    return matched
+
+
+def fill_gaps(current, incoming):
+    """Campos de `incoming` só para o que está vazio/'Desconhecido' em `current`"""
+    return {
+        f: incoming[f] for f in GAP_FIELDS
+        if is_placeholder(current.get(f)) and not is_placeholder(incoming.get(f))
+    }
+
+
+def fetch_batch(names, url=None, headers=None):
+    """Uma chamada ao LLM para o lote inteiro; devolve as linhas válidas do CSV"""
+    payload = build_payload(names)
+    headers = headers or {
+        "Authorization": f"Bearer {os.getenv('PERPLEXY_API_KEY')}",
+        "Content-Type": "application/json",
+    }
+
+    def call_api():
+        start = time.perf_counter()
+        try:
+            r = httpx.post(url or PERPLEXY_URL, json=payload, headers=headers, timeout=120)
+        except httpx.TransportError:
+            metrics.record_llm_call("enriquecimento", time.perf_counter() - start, "erro_rede")
+            raise
+        if r.status_code != 200:
+            metrics.record_llm_call("enriquecimento", time.perf_counter() - start, r.status_code)
+            print("Erro Perplexy:", r.status_code, r.text)
+            return None
+        data = r.json()
+        metrics.record_llm_call("enriquecimento", time.perf_counter() - start, r.status_code, data)
+        return data
+
+    data = llm_cache.get_or_fetch(payload, call_api)
+    if data is None:
+        raise RuntimeError(f"falha ao consultar o LLM para {len(names)} startups")
+    parsed = parse_startups_csv(data["choices"][0]["message"]["content"])
+    for q in parsed.quarantine:
+        print("Erro ao converter linha do CSV:", q["linha"], q["conteudo"], q["motivo"])
+    return parsed.rows
+
+
+def enrich_names(session, names, url=None, headers=None):
+    """Enriquece as startups `names` em lotes, preenchendo só campos vazios.
+
+    Retorna {nome: campos preenchidos}; nomes sem correspondência na resposta
+    ficam com 0.
+    """
+    table = Startup.__table__
+    result = {n: 0 for n in names}
+    for batch in pack(names):
+        # LLM antes de ler o banco: a chamada pode levar minutos e edições feitas
+        # nesse meio tempo não podem ser desfeitas pelo estado lido antes dela
+        matched = match_rows(batch, fetch_batch(batch, url, headers))
+        crud.lock_startups(session, batch)
+        existing = {
+            r["nome"]: r for r in
+            (dict(m._mapping) for m in session.execute(select(table).where(table.c.nome.in_(batch))))
+        }
+        updates = []
+        for name in batch:
+            row = matched.get(name)
+            if row is None:
+                metrics.enrichment_startups.inc("sem_correspondencia")
+                continue
+            current = existing.get(name, {"nome": name})
+            gaps = fill_gaps(current, row)
+            if not gaps:
+                metrics.enrichment_startups.inc("sem_lacunas")
+                continue
+            # só nome + lacunas; o hash de conteúdo vem do estado final (lido sob a trava)
+            merged = {**{c: current.get(c) for c in ["nome", *GAP_FIELDS]}, **gaps}
+            updates.append({"nome": name, **gaps, "conteudo_hash": crud.row_hash(merged)})
+            result[name] = len(gaps)
+            metrics.enrichment_startups.inc("enriquecida")
+        if updates:
+            crud.bulk_upsert_startups(session, updates)
+        else:
+            # libera as travas do lote
+            session.commit()
+    return result
+
+
+def pending_names(session, limit=1000):
+    """Startups com algum campo vazio ou 'Desconhecido', candidatas a enriquecimento"""
+    table = Startup.__table__
+    unknown = sorted(u for u in UNKNOWN if u)
+    conditions = []
+    for f in GAP_FIELDS:
+        col = table.c[f]
+        conditions.append(col.is_(None))
+        if col.type.python_type is str:
+            conditions.append(func.lower(func.trim(col)).in_(unknown))
+    stmt = select(table.c.nome).where(or_(*conditions)).order_by(table.c.id).limit(limit)
+    return list(session.execute(stmt).scalars())
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        names = pending_names(session)
+        result = enrich_names(session, names)
+        print(f"{sum(1 for v in result.values() if v)} de {len(names)} startups enriquecidas "
+              f"em {len(pack(names))} chamadas ao LLM.")
+    finally:
+        session.close()
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import select
+from .crud import apply_filters
+from .db import AsyncSessionLocal
+from .models import Startup
+
+# Linhas buscadas por ida ao banco (cursor do lado do servidor)
+EXPORT_BATCH_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"tipo não serializável: {type(value).__name__}")
+
+
+async def _stream_rows(names, filters):
+    """Tuplas direto do cursor do servidor, sem instanciar objetos ORM.
+
+    A sessão é aberta aqui, e não via Depends, porque precisa viver até o fim
+    do streaming da resposta.
+    """
+    table = Startup.__table__
+    stmt = apply_filters(select(*[table.c[n] for n in names]), filters).order_by(table.c.id)
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for chunk in result.partitions():
+            yield chunk
+
+
+async def iter_ndjson(names, filters=None):
+    async for chunk in _stream_rows(names, filters or {}):
+        yield "".join(
+            json.dumps(dict(zip(names, row)), default=_json_default, ensure_ascii=False) + "\n"
+            for row in chunk
+        )
+
+
+async def iter_csv(names, filters=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(names)
+    async for chunk in _stream_rows(names, filters or {}):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # cabeçalho sozinho quando não há linhas
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from . import versao
+
+# Respostas serializadas mantidas em memória (pode ser sobrescrito via .env)
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "512"))
+
+
+class ResponseCache:
+    """LRU de corpos JSON já serializados, por (rota, query, versão dos dados).
+
+    Entradas de versões antigas nunca são servidas de novo; saem pelo LRU.
+    """
+
+    def __init__(self, max_entries=HTTP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache()
+
+
+def _query_key(request):
+    # ordem dos parâmetros na URL não muda a resposta
+    return "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+
+def make_etag(version, path, query):
+    digest = hashlib.sha256(f"{version}|{path}?{query}".encode("utf-8")).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _not_modified(request, etag, last_modified):
+    # If-None-Match tem precedência sobre If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = _utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+        return _utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+async def cached_response(request, session, build, vary="", serializer=None):
+    """GET condicional para leituras derivadas de startups.
+
+    Custa uma consulta pela versão dos dados: se o cliente já tem essa versão
+    responde 304 sem corpo; senão serve do cache em memória ou chama
+    `build(sync_session)`, que devolve (conteúdo, headers extras). `vary`
+    entra na chave quando a resposta depende de algo além dos dados (ex.: a data).
+    `serializer` é o TypeAdapter do schema de resposta, que gera os bytes JSON
+    direto; sem ele, cai no jsonable_encoder.
+    """
+    version, modified = await session.run_sync(versao.current)
+    path, query = request.url.path, _query_key(request) + vary
+    etag = make_etag(version, path, query)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(_utc(modified), usegmt=True)
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+
+    key = (path, query, version)
+    entry = response_cache.get(key)
+    if entry is None:
+        content, extra = await session.run_sync(build)
+        body = serializer.dump_json(content) if serializer is not None else JSONResponse(jsonable_encoder(content)).body
+        entry = (body, extra or {})
+        response_cache.set(key, entry)
+    body, extra = entry
+    return Response(body, media_type="application/json", headers={**extra, **headers})
@@ -0,0 +1,185 @@
+from datetime import datetime
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from . import versao
+from .llm_csv import UNKNOWN
+from .models import Investidor, Startup, StartupInvestidor
+
+# Colunas de startups devolvidas no portfólio de um investidor
+PORTFOLIO_COLUMNS = ["id", "nome", "setor", "rodada", "data_investimento", "valor_investimento_brl", "localizacao"]
+
+
+def split_names(value):
+    """'Kaszek, QED Investors' -> ['Kaszek', 'QED Investors'], sem repetidos nem 'Desconhecido'"""
+    names = []
+    for name in (value or "").split(","):
+        name = name.strip()
+        if name and name.lower() not in UNKNOWN and name not in names:
+            names.append(name)
+    return names
+
+
+def ensure_investidores(session, names):
+    """Cria os investidores que ainda não existem e retorna {nome: id}"""
+    names = sorted(set(names))
+    if not names:
+        return {}
+    table = Investidor.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert_fn = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert_fn(table).values([{"nome": n} for n in names]).on_conflict_do_nothing(index_elements=[table.c.nome])
+        session.execute(stmt)
+    else:
+        existing = set(session.execute(select(table.c.nome).where(table.c.nome.in_(names))).scalars())
+        missing = [{"nome": n} for n in names if n not in existing]
+        if missing:
+            session.execute(table.insert(), missing)
+    return dict(session.execute(select(table.c.nome, table.c.id).where(table.c.nome.in_(names))).all())
+
+
+def sync_links(session, rows):
+    """Regrava os vínculos das startups do lote a partir de vc_investidor.
+
+    `rows` são dicts com `id` e `vc_investidor`, como os devolvidos pelo upsert.
+    """
+    by_startup = {r["id"]: split_names(r.get("vc_investidor")) for r in rows if r.get("id") is not None}
+    if not by_startup:
+        return
+    ids = ensure_investidores(session, [n for names in by_startup.values() for n in names])
+    link = StartupInvestidor.__table__
+    session.execute(delete(link).where(link.c.startup_id.in_(list(by_startup))))
+    links = [
+        {"startup_id": startup_id, "investidor_id": ids[name]}
+        for startup_id, names in by_startup.items() for name in names
+    ]
+    if links:
+        session.execute(link.insert(), links)
+
+
+def backfill(session, batch_size=1000):
+    """Monta startup_investidores para as startups já gravadas, em lotes por id"""
+    table = Startup.__table__
+    last_id, total = 0, 0
+    while True:
+        rows = [
+            dict(r._mapping) for r in session.execute(
+                select(table.c.id, table.c.vc_investidor)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            )
+        ]
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        sync_links(session, rows)
+        # portfólios servidos pela API mudaram: invalida ETags
+        versao.bump(session, datetime.utcnow())
+        session.commit()
+        total += len(rows)
+    return total
+
+
+def has_investidor(nome):
+    """Condição para filtrar startups por investidor via join indexado (sem LIKE)"""
+    link = StartupInvestidor.__table__
+    inv = Investidor.__table__
+    return (
+        select(link.c.startup_id)
+        .join(inv, inv.c.id == link.c.investidor_id)
+        .where(inv.c.nome == nome, link.c.startup_id == Startup.__table__.c.id)
+        .exists()
+    )
+
+
+def list_investidores(session, limit=100):
+    """Investidores com número de startups e total investido, do maior portfólio para o menor"""
+    inv = Investidor.__table__
+    link = StartupInvestidor.__table__
+    startups = Startup.__table__
+    stmt = (
+        select(
+            inv.c.id, inv.c.nome, inv.c.origem, inv.c.setor_preferido,
+            func.count(link.c.startup_id).label("startups"),
+            func.coalesce(func.sum(startups.c.valor_investimento_brl), 0).label("investido"),
+        )
+        .join(link, link.c.investidor_id == inv.c.id)
+        .join(startups, startups.c.id == link.c.startup_id)
+        .group_by(inv.c.id, inv.c.nome, inv.c.origem, inv.c.setor_preferido)
+        .order_by(func.count(link.c.startup_id).desc(), inv.c.nome)
+        .limit(limit)
+    )
+    return [dict(r._mapping) for r in session.execute(stmt)]
+
+
+def _investidor_id(session, nome):
+    return session.execute(select(Investidor.id).where(Investidor.nome == nome)).scalar()
+
+
+def portfolio(session, nome):
+    """Startups de um investidor; None se o investidor não existe"""
+    investidor_id = _investidor_id(session, nome)
+    if investidor_id is None:
+        return None
+    startups = Startup.__table__
+    link = StartupInvestidor.__table__
+    stmt = (
+        select(*[startups.c[c] for c in PORTFOLIO_COLUMNS])
+        .join(link, link.c.startup_id == startups.c.id)
+        .where(link.c.investidor_id == investidor_id)
+        .order_by(startups.c.data_investimento.desc().nulls_last(), startups.c.id)
+    )
+    return [dict(r._mapping) for r in session.execute(stmt)]
+
+
+def coinvestidores(session, nome, limit=20):
+    """Quem mais investiu junto com `nome`, com o número de startups em comum"""
+    investidor_id = _investidor_id(session, nome)
+    if investidor_id is None:
+        return None
+    inv = Investidor.__table__
+    mine = StartupInvestidor.__table__.alias("mine")
+    other = StartupInvestidor.__table__.alias("other")
+    comum = func.count().label("startups_em_comum")
+    stmt = (
+        select(inv.c.id, inv.c.nome, comum)
+        .select_from(mine)
+        .join(other, and_(other.c.startup_id == mine.c.startup_id, other.c.investidor_id != mine.c.investidor_id))
+        .join(inv, inv.c.id == other.c.investidor_id)
+        .where(mine.c.investidor_id == investidor_id)
+        .group_by(inv.c.id, inv.c.nome)
+        .order_by(comum.desc(), inv.c.nome)
+        .limit(limit)
+    )
+    return [dict(r._mapping) for r in session.execute(stmt)]
+
+
+def coinvestimentos(session, limit=20):
+    """Pares de investidores que mais aparecem juntos na mesma startup"""
+    a = StartupInvestidor.__table__.alias("a")
+    b = StartupInvestidor.__table__.alias("b")
+    inv_a = Investidor.__table__.alias("inv_a")
+    inv_b = Investidor.__table__.alias("inv_b")
+    comum = func.count().label("startups_em_comum")
+    stmt = (
+        select(inv_a.c.nome.label("investidor_a"), inv_b.c.nome.label("investidor_b"), comum)
+        .select_from(a)
+        .join(b, and_(b.c.startup_id == a.c.startup_id, b.c.investidor_id > a.c.investidor_id))
+        .join(inv_a, inv_a.c.id == a.c.investidor_id)
+        .join(inv_b, inv_b.c.id == b.c.investidor_id)
+        .group_by(inv_a.c.nome, inv_b.c.nome)
+        .order_by(comum.desc(), inv_a.c.nome, inv_b.c.nome)
+        .limit(limit)
+    )
+    return [dict(r._mapping) for r in session.execute(stmt)]
+
+
+if __name__ == "__main__":
+    from .db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Vínculos startup–investidor montados para {backfill(session)} startups.")
+    finally:
+        session.close()
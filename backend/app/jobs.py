@@ -0,0 +1,231 @@
+import os
+import random
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from .db import SessionLocal
+from .models import EnrichmentJob
+
+# Configuração da fila de enriquecimento (pode ser sobrescrita via .env)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "20"))  # jobs entregues juntos ao handler
+JOB_BATCH_LINGER = float(os.getenv("JOB_BATCH_LINGER", "1"))  # segundos esperando mais jobs após um aviso
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "30"))  # segundos antes da 2ª tentativa
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "900"))
+# 'executando' sem renovação há mais que isso é de um processo que caiu
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+ACTIVE_STATUSES = ("pendente", "executando")
+
+
+def serialize(job):
+    return {
+        "id": job.id,
+        "nome": job.nome,
+        "status": job.status,
+        "tentativas": job.tentativas,
+        "resultado": job.resultado,
+        "erro": job.erro,
+        "criado_em": job.criado_em,
+        "atualizado_em": job.atualizado_em,
+    }
+
+
+def _active_job(session, nome):
+    return session.execute(
+        select(EnrichmentJob).where(EnrichmentJob.nome == nome, EnrichmentJob.status.in_(ACTIVE_STATUSES))
+    ).scalars().first()
+
+
+def enqueue(session, nome):
+    """Cria um job para `nome`, ou devolve o que já está pendente/executando"""
+    job = _active_job(session, nome)
+    if job is not None:
+        return job
+    now = datetime.utcnow()
+    job = EnrichmentJob(nome=nome, status="pendente", tentativas=0, criado_em=now, atualizado_em=now)
+    session.add(job)
+    try:
+        session.commit()
+    except IntegrityError:
+        # outro request criou o job ativo entre o SELECT e o INSERT
+        session.rollback()
+        return _active_job(session, nome)
+    session.refresh(job)
+    return job
+
+
+def get_job(session, job_id):
+    return session.get(EnrichmentJob, job_id)
+
+
+def retry_delay(tentativas):
+    """Backoff exponencial com jitter: um 429 no lote não gasta todas as tentativas de uma vez"""
+    return random.uniform(0.5, 1.0) * min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** max(0, tentativas - 1))
+
+
+def claim_next(session):
+    """Marca o job pendente mais antigo como executando; seguro entre workers e processos"""
+    while True:
+        available = or_(EnrichmentJob.disponivel_em.is_(None), EnrichmentJob.disponivel_em <= datetime.utcnow())
+        job_id = session.execute(
+            select(EnrichmentJob.id)
+            .where(EnrichmentJob.status == "pendente", available)
+            .order_by(EnrichmentJob.id).limit(1)
+        ).scalar()
+        if job_id is None:
+            return None
+        claimed = session.execute(
+            update(EnrichmentJob)
+            .where(EnrichmentJob.id == job_id, EnrichmentJob.status == "pendente")
+            .values(status="executando", tentativas=EnrichmentJob.tentativas + 1, atualizado_em=datetime.utcnow())
+        )
+        session.commit()
+        if claimed.rowcount == 1:
+            return session.get(EnrichmentJob, job_id)
+
+
+def claim_batch(session, limit):
+    """Até `limit` jobs pendentes, cada um marcado como executando por claim_next"""
+    claimed = []
+    while len(claimed) < limit:
+        job = claim_next(session)
+        if job is None:
+            break
+        claimed.append(job)
+    return claimed
+
+
+def renew_lease(session, job_ids):
+    """Renova atualizado_em dos jobs em execução, mostrando que o worker está vivo"""
+    session.execute(
+        update(EnrichmentJob)
+        .where(EnrichmentJob.id.in_(job_ids), EnrichmentJob.status == "executando")
+        .values(atualizado_em=datetime.utcnow())
+    )
+    session.commit()
+
+
+def requeue_stale(session, lease_seconds=JOB_LEASE_SECONDS):
+    """Jobs 'executando' com lease vencido (processo caiu) voltam para a fila.
+
+    Jobs de outros processos vivos não são tocados: o worker renova o lease
+    enquanto o lote roda.
+    """
+    now = datetime.utcnow()
+    session.execute(
+        update(EnrichmentJob)
+        .where(EnrichmentJob.status == "executando",
+               EnrichmentJob.atualizado_em < now - timedelta(seconds=lease_seconds))
+        .values(status="pendente", atualizado_em=now)
+    )
+    session.commit()
+
+
+class WorkerPool:
+    """Threads que consomem enrichment_jobs em lotes chamando `handler(session, nomes)`.
+
+    O handler retorna {nome: resultado} para gravar em cada job. Exceções
+    contam como tentativa para todos os jobs do lote, que voltam à fila só
+    após retry_delay; após JOB_MAX_ATTEMPTS o job fica com status 'erro'.
+    """
+
+    def __init__(self, handler, workers=JOB_WORKERS, poll_interval=JOB_POLL_INTERVAL,
+                 batch_size=JOB_BATCH_SIZE, linger=JOB_BATCH_LINGER, lease_seconds=JOB_LEASE_SECONDS):
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.linger = linger
+        self.lease_seconds = lease_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self.requeue_stale()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"enrichment-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        self._wake.set()
+
+    def requeue_stale(self):
+        session = SessionLocal()
+        try:
+            requeue_stale(session, self.lease_seconds)
+        finally:
+            session.close()
+
+    def _heartbeat(self, job_ids, done):
+        # lease renovado em thread própria: a chamada ao LLM pode demorar minutos
+        session = SessionLocal()
+        try:
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    renew_lease(session, job_ids)
+                except Exception as e:
+                    session.rollback()
+                    print("Erro ao renovar lease dos jobs", job_ids, e)
+        finally:
+            session.close()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self.run_once():
+                # fila vazia: recupera jobs de réplicas que caíram sem esperar um restart
+                self.requeue_stale()
+                woke = self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                if woke and self.linger:
+                    # POSTs em rajada entram no mesmo lote em vez de um prompt cada
+                    self._stop.wait(self.linger)
+
+    def run_once(self):
+        """Processa um lote de jobs se houver; retorna False quando a fila está vazia"""
+        session = SessionLocal()
+        try:
+            batch = claim_batch(session, self.batch_size)
+            if not batch:
+                return False
+            done = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=([job.id for job in batch], done), daemon=True)
+            heartbeat.start()
+            try:
+                results = self.handler(session, [job.nome for job in batch])
+                for job in batch:
+                    job.resultado = results.get(job.nome)
+                    job.status = "concluido"
+                    job.erro = None
+            except Exception as e:
+                session.rollback()
+                print("Erro no lote de enriquecimento", [job.id for job in batch], e)
+                erro = "".join(traceback.format_exception_only(type(e), e)).strip()
+                retry_at = datetime.utcnow()
+                for job in batch:
+                    job.erro = erro
+                    job.status = "erro" if job.tentativas >= JOB_MAX_ATTEMPTS else "pendente"
+                    job.disponivel_em = retry_at + timedelta(seconds=retry_delay(job.tentativas))
+            finally:
+                done.set()
+                heartbeat.join()
+            now = datetime.utcnow()
+            for job in batch:
+                job.atualizado_em = now
+            session.commit()
+            return True
+        finally:
+            session.close()
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Configuração do cache de respostas do LLM (pode ser sobrescrita via .env)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")  # ex.: ./llm_cache.sqlite3; vazio = só memória
+
+
+def cache_key(payload):
+    """Chave estável: modelo + hash das mensagens do prompt"""
+    prompt = json.dumps(payload.get("messages"), sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{payload.get('model')}:{digest}"
+
+
+class SQLiteTier:
+    """Segundo nível opcional em disco, sobrevive a restart do processo"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMCache:
+    """Cache LRU com TTL para respostas do LLM, com deduplicação de chamadas em voo.
+
+    Só respostas válidas (não None) são armazenadas; falhas sempre vão ao upstream
+    na próxima tentativa.
+    """
+
+    def __init__(self, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES, path=LLM_CACHE_PATH):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = SQLiteTier(path) if path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+        if self.disk is not None:
+            found = self.disk.get(key)
+            if found is not None:
+                value, expires_at = found
+                self._store(key, value, expires_at)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self.disk is not None:
+            self.disk.set(key, value, expires_at)
+
+    def get_or_fetch(self, payload, fetch):
+        """Versão síncrona: threads pedindo o mesmo prompt compartilham uma única chamada"""
+        key = cache_key(payload)
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            waiter = self._inflight.get(key)
+            leader = waiter is None
+            if leader:
+                waiter = self._inflight[key] = {"event": threading.Event(), "value": None}
+            else:
+                self.shared += 1
+        if not leader:
+            waiter["event"].wait()
+            return waiter["value"]
+        try:
+            value = fetch()
+            if value is not None:
+                self.set(key, value)
+            waiter["value"] = value
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter["event"].set()
+
+    async def aget_or_fetch(self, payload, fetch):
+        """Versão assíncrona: `fetch` é uma função que retorna uma corrotina"""
+        key = cache_key(payload)
+        value = self.get(key)
+        if value is not None:
+            return value
+        future = self._ainflight.get(key)
+        if future is not None:
+            with self._lock:
+                self.shared += 1
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._ainflight[key] = future
+        try:
+            value = await fetch()
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # evita "exception was never retrieved" quando ninguém estava esperando
+            future.exception()
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "disk": self.disk is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared_inflight": self.shared,
+            }
+
+
+# Instância compartilhada pela API e pelo ETL
+llm_cache = LLMCache()
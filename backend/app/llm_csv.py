@@ -0,0 +1,224 @@
+import csv
+import io
+import re
+import unicodedata
+from functools import lru_cache
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional
+from pydantic import TypeAdapter, ValidationError
+from .schemas import StartupRowDict
+
+# Ordem pedida no prompt; usada quando o LLM omite o cabeçalho
+FIELD_ORDER = [
+    "nome", "site", "setor", "ano_fundacao", "valor_investimento", "rodada", "data_investimento",
+    "vc_investidor", "descricao_breve", "linkedin_fundador", "localizacao",
+]
+
+# Cabeçalhos normalizados (sem acento, minúsculos, só letras/dígitos) -> campo
+HEADER_ALIASES = {
+    "nomedastartup": "nome",
+    "nome": "nome",
+    "startup": "nome",
+    "site": "site",
+    "setor": "setor",
+    "anodefundacao": "ano_fundacao",
+    "valordoinvestimentoemreais": "valor_investimento",
+    "valordoinvestimento": "valor_investimento",
+    "rodada": "rodada",
+    "datadoinvestimento": "data_investimento",
+    "vcinvestidor": "vc_investidor",
+    "descricaobreve": "descricao_breve",
+    "linkedindofundador": "linkedin_fundador",
+    "localizacaopais": "localizacao",
+    "localizacao": "localizacao",
+}
+
+# Marcadores de "sem informação" para campos tipados (ano e data)
+UNKNOWN = {"", "desconhecido", "desconhecida", "n/a", "na", "-", "none", "null"}
+
+
+def is_placeholder(value):
+    """None, vazio ou 'Desconhecido' e variações: campo sem informação"""
+    return value is None or (isinstance(value, str) and value.strip().lower() in UNKNOWN)
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+# Valida direto para dicts (sem instanciar/serializar um modelo por linha)
+_rows_adapter = TypeAdapter(List[StartupRowDict])
+
+
+def _normalize_header(value):
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub("", value.lower())
+
+
+class DateDetector:
+    """Reconhece o formato de data uma vez e reaproveita nas linhas seguintes do lote"""
+
+    FORMATS = [
+        ("%Y-%m-%d", re.compile(r"^\d{4}-\d{2}-\d{2}$"), date.fromisoformat),
+        ("%d/%m/%Y", re.compile(r"^\d{2}/\d{2}/\d{4}$"), lambda v: date(int(v[6:10]), int(v[3:5]), int(v[:2]))),
+        ("%d-%m-%Y", re.compile(r"^\d{2}-\d{2}-\d{4}$"), lambda v: date(int(v[6:10]), int(v[3:5]), int(v[:2]))),
+        ("%Y-%m", re.compile(r"^\d{4}-\d{2}$"), lambda v: date(int(v[:4]), int(v[5:7]), 1)),
+        ("%m/%Y", re.compile(r"^\d{2}/\d{4}$"), lambda v: date(int(v[3:7]), int(v[:2]), 1)),
+    ]
+
+    def __init__(self):
+        self.learned = None
+
+    def parse(self, value):
+        if value is None:
+            return None
+        value = value.strip()
+        if value.lower() in UNKNOWN:
+            return None
+        if self.learned is not None:
+            result = self._try(self.learned, value)
+            if result is not None:
+                return result
+        for fmt in self.FORMATS:
+            if fmt is self.learned:
+                continue
+            result = self._try(fmt, value)
+            if result is not None:
+                self.learned = fmt
+                return result
+        return None
+
+    @staticmethod
+    def _try(fmt, value):
+        _, pattern, build = fmt
+        if not pattern.match(value):
+            return None
+        try:
+            return build(value)
+        except ValueError:
+            return None
+
+    @property
+    def format(self):
+        return self.learned[0] if self.learned else None
+
+
+@dataclass
+class ParseResult:
+    rows: list = field(default_factory=list)
+    quarantine: list = field(default_factory=list)  # {"linha", "conteudo", "motivo"}
+    date_format: Optional[str] = None
+
+
+def strip_fences(text):
+    return text.replace("```csv", "").replace("```", "").strip()
+
+
+def _iter_lines(text):
+    """Linhas úteis da resposta, sem cercas de markdown, vazias ou reticências"""
+    for line in io.StringIO(text):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("```") or stripped in ("...", "…"):
+            continue
+        yield stripped
+
+
+def _detect_header(cells):
+    mapping = [HEADER_ALIASES.get(_normalize_header(c)) for c in cells]
+    return mapping if sum(1 for m in mapping if m) >= 3 else None
+
+
+@lru_cache(maxsize=1024)
+def _clean_vc(value):
+    # O LLM às vezes devolve a lista Python como texto: "['Kaszek', 'QED']"
+    if value and value.startswith("["):
+        value = value.replace("[", "").replace("]", "").replace("'", "").replace('"', "").strip()
+        return ", ".join(v.strip() for v in value.split(",") if v.strip())
+    return value
+
+
+def iter_records(text, detector=None, default_vc=None):
+    """Gera (número da linha, células, dict mapeado ou motivo de rejeição).
+
+    O cabeçalho e o delimitador são detectados uma vez; as linhas são lidas
+    sob demanda, sem montar a lista inteira antes.
+    """
+    detector = detector or DateDetector()
+    lines = _iter_lines(text)
+    first = next(lines, None)
+    if first is None:
+        return
+    delimiter = ";" if first.count(";") >= first.count(",") else ","
+
+    def with_first():
+        yield first
+        yield from lines
+
+    mapping = None
+    reader = csv.reader(with_first(), delimiter=delimiter, skipinitialspace=True)
+    for number, cells in enumerate(reader, start=1):
+        if mapping is None:
+            mapping = _detect_header([c.strip() for c in cells])
+            if mapping is not None:
+                width = len(mapping)
+                names = [(i, name) for i, name in enumerate(mapping) if name]
+                continue
+            if len(cells) != len(FIELD_ORDER):
+                # texto antes da tabela ("Aqui está a lista:"...)
+                continue
+            # sem cabeçalho: assume a ordem do prompt
+            mapping = FIELD_ORDER
+            width = len(mapping)
+            names = list(enumerate(mapping))
+        if len(cells) != width:
+            yield number, cells, f"esperadas {width} colunas, recebidas {len(cells)}"
+            continue
+        record = {name: cells[i].rstrip() for i, name in names}
+        if is_placeholder(record.get("nome")):
+            # sem nome não há startup: viraria uma linha chamada 'Desconhecido'
+            yield number, cells, "nome ausente ou 'Desconhecido'"
+            continue
+        ano = record.get("ano_fundacao")
+        if ano is not None and ano.lower() in UNKNOWN:
+            record["ano_fundacao"] = None
+        if "data_investimento" in record:
+            record["data_investimento"] = detector.parse(record["data_investimento"])
+        vc = record.get("vc_investidor")
+        if vc and vc[0] == "[":
+            record["vc_investidor"] = _clean_vc(vc)
+        if default_vc and not record.get("vc_investidor"):
+            record["vc_investidor"] = default_vc
+        yield number, cells, record
+
+
+def parse_startups_csv(text, default_vc=None):
+    """Lê a resposta CSV do LLM e valida todas as linhas de uma vez.
+
+    Linhas que não passam na validação vão para `quarantine` com o motivo,
+    sem derrubar o lote.
+    """
+    detector = DateDetector()
+    result = ParseResult()
+    records, raws = [], []
+    for number, cells, record in iter_records(strip_fences(text), detector, default_vc):
+        if isinstance(record, str):
+            result.quarantine.append({"linha": number, "conteudo": ";".join(cells), "motivo": record})
+            continue
+        records.append(record)
+        raws.append((number, cells))
+
+    try:
+        validated = _rows_adapter.validate_python(records)
+    except ValidationError as e:
+        reasons = {}
+        for err in e.errors():
+            index = err["loc"][0]
+            where = ".".join(str(p) for p in err["loc"][1:])
+            reasons.setdefault(index, []).append(f"{where}: {err['msg']}")
+        for index in sorted(reasons):
+            number, cells = raws[index]
+            result.quarantine.append({"linha": number, "conteudo": ";".join(cells), "motivo": "; ".join(reasons[index])})
+        records = [r for i, r in enumerate(records) if i not in reasons]
+        validated = _rows_adapter.validate_python(records)
+
+    result.rows = validated
+    result.date_format = detector.format
+    return result
@@ -1,12 +1,15 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, date
+from typing import List, Optional
 from pydantic import BaseModel
-from . import models, db, schemas
-import httpx, io, csv
+from . import models, db, schemas, crud, stats, export, jobs, search, investidores, http_cache, metrics, enrichment
+from .llm_cache import llm_cache
 import os
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,17 +22,22 @@ app.add_middleware(
     allow_origins=['http://localhost:3000'],  # altere para o domínio do seu frontend
     allow_credentials=True,
     allow_methods=['*'],
-    allow_headers=['*']
+    allow_headers=['*'],
+    expose_headers=['X-Next-Cursor', 'ETag', 'Last-Modified']
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Tempo e quantidade de SQL por requisição (API) e nos workers/ETL (engine síncrono)
+metrics.instrument_engine(db.engine, "sync")
+metrics.instrument_engine(db.async_engine.sync_engine, "async")
 
 PERPLEXY_KEY = os.getenv("PERPLEXY_API_KEY")
-vc = ["Kaszek", "Monashees", "Softbank LatAm", "Astella Investimentos", "Valor Capital Group", "Bossanova", "Angel Ventures", "Crescera Capital", "QED Investors"]
 
 
 # Verify that the API key is available
 if not PERPLEXY_KEY:
     raise ValueError("PERPLEXY_API_KEY environment variable not set")
-PERPLEXY_URL = "https://api.perplexity.ai/chat/completions"
+PERPLEXY_URL = os.getenv("PERPLEXY_URL", "https://api.perplexity.ai/chat/completions")
 HEADERS = {
     "Authorization": f"Bearer {PERPLEXY_KEY}",
     "Content-Type": "application/json"
@@ -48,169 +56,240 @@ class StartupCreate(BaseModel):
     linkedin_fundador: str 
     localizacao: str 
 
-def parse_int(value):
-    if value and value.strip().isdigit():
-        return int(value.strip())
-    return None
-
-def fetch_startup_data(nome: str):
-    payload = {
-            "model": "sonar-pro",
-    "messages": [
-        {"role": "system", "content": "Você é um assistente especializado em fornecer dados estruturados de startups."},
-        {"role": "user", "content": f"""
-        Liste exatamente 10 startups investidas pelo VC {vc} em formato CSV.
-
-        As colunas devem ser exatamente nesta ordem:
-        Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)
-
-        Regras:
-        - Nunca deixe nenhum campo vazio. Se não houver informação, escreva 'Desconhecido'.
-        - Use sempre ponto e vírgula (;) como separador de colunas.
-        - Retorne apenas a tabela em CSV puro, sem markdown, sem cabeçalho extra e sem comentários.
-        - A tabela deve conter exatamente 11 linhas: 1 cabeçalho + 10 startups.
-
-        Exemplo de formato esperado (apenas ilustrativo, substitua pelos dados corretos):
-
-        Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)
-        Startup A; www.startupa.com; Fintech; 2018; 5.000.000; Série A; 2021-06-15; {vc}; Plataforma de pagamentos digitais; linkedin.com/in/fundadorA; Brasil
-        Startup B; www.startupb.com; Healthtech; 2019; 2.500.000; Seed; 2020-11-20; {vc}; App de consultas médicas; linkedin.com/in/fundadorB; EUA
-        ...
-        Startup J; www.startupj.com; Edtech; 2017; 8.000.000; Série B; 2022-05-10; {vc}; Plataforma de ensino online; linkedin.com/in/fundadorJ; Canadá
-        """}
-        ]
-    }
-
-    try:
-        r = httpx.post(PERPLEXY_URL, json=payload, headers=HEADERS, timeout=60)
-        if r.status_code != 200:
-            print("Erro Perplexy:", r.status_code, r.text)
-            return []
-
-        data = r.json()
-        csv_text = data["choices"][0]["message"]["content"]
-        print("==== CSV recebido da API ====")
-        print(csv_text)
-        csv_text = csv_text.replace("```csv", "").replace("```", "").strip()
-        reader = csv.DictReader(io.StringIO(csv_text), delimiter=';')
-        rows = list(reader)
-        startups = []
-        for row in rows:
-            row_clean = {k.strip(): v.strip() if isinstance(v, str) else v for k, v in row.items()}
-            # Trata vc_investidor para remover colchetes e aspas
-            vc_raw = row_clean.get("VC Investidor")
-            if vc_raw:
-                if isinstance(vc_raw, str) and vc_raw.startswith("["):
-                    vc_raw = vc_raw.replace("[", "").replace("]", "").replace("'", "").strip()
-                    row_clean["VC Investidor"] = ", ".join([v.strip() for v in vc_raw.split(",")])
-            # Trata data_investimento para converter para date
-            data_raw = row_clean.get("Data do Investimento")
-            if data_raw:
-                try:
-                    # Tenta YYYY-MM-DD
-                    row_clean["Data do Investimento"] = datetime.strptime(data_raw, "%Y-%m-%d").date()
-                except:
-                    try:
-                        # Tenta YYYY-MM
-                        row_clean["Data do Investimento"] = datetime.strptime(data_raw, "%Y-%m").date()
-                    except:
-                        try:
-                            # Tenta DD/MM/YYYY
-                            row_clean["Data do Investimento"] = datetime.strptime(data_raw, "%d/%m/%Y").date()
-                        except:
-                            row_clean["Data do Investimento"] = None
-            try:
-                startup = schemas.StartupCreate.parse_obj(row_clean)
-                startups.append(startup.dict())
-            except Exception as e:
-                print("Erro ao converter linha do CSV:", row_clean, e)
-        return startups
-    except Exception as e:
-        print("Erro ao buscar dados da API:", e)
-        return []
-
-@app.post("/api/startups")
-def create_startup(payload: StartupCreate, session: Session = Depends(db.get_session)):
-    exists = session.query(models.Startup).filter(models.Startup.nome == payload.nome).first()
-    
-    # Busca dados da API Perplexy
-    api_startups = fetch_startup_data(payload.nome)
-    # Se a API retornar startups, atualize ou insira cada uma
-    if api_startups:
-        results = []
-        for api_data in api_startups:
-            # Tratar data_investimento
-            data = api_data.get("data_investimento")
-            if data is None or (isinstance(data, str) and not data.strip()):
-                api_data["data_investimento"] = None
-            else:
-                try:
-                    api_data["data_investimento"] = datetime.strptime(data, "%d/%m/%Y").date()
-                except:
-                    try:
-                        api_data["data_investimento"] = datetime.strptime(data, "%Y-%m-%d").date()
-                    except:
-                        api_data["data_investimento"] = None
-
-            # Não sobrescreva vc_investidor se já existe valor
-            if not api_data.get("vc_investidor"):
-                api_data["vc_investidor"] = "Desconhecido"
-
-            exists = session.query(models.Startup).filter(models.Startup.nome == api_data["nome"]).first()
-            if exists:
-                for field, value in api_data.items():
-                    if value is not None:
-                        setattr(exists, field, value)
-                exists.atualizado_em = datetime.utcnow()
-                session.commit()
-                session.refresh(exists)
-                results.append(exists)
-            else:
-                s = models.Startup(**api_data, atualizado_em=datetime.utcnow())
-                session.add(s)
-                session.commit()
-                session.refresh(s)
-                results.append(s)
-        return [r.__dict__ for r in results]
-    # Se não veio nada da API, insere/atualiza normalmente
-    payload_dict = payload.dict()
-    data = payload_dict.get("data_investimento")
+def normalize_startup(data_dict):
+    # Tratar data_investimento
+    data = data_dict.get("data_investimento")
     if data is None or (isinstance(data, str) and not data.strip()):
-        payload_dict["data_investimento"] = None
-    else:
+        data_dict["data_investimento"] = None
+    elif not isinstance(data, date):
         try:
-            payload_dict["data_investimento"] = datetime.strptime(data, "%d/%m/%Y").date()
+            data_dict["data_investimento"] = datetime.strptime(data, "%d/%m/%Y").date()
         except:
             try:
-                payload_dict["data_investimento"] = datetime.strptime(data, "%Y-%m-%d").date()
+                data_dict["data_investimento"] = datetime.strptime(data, "%Y-%m-%d").date()
             except:
-                payload_dict["data_investimento"] = None
+                data_dict["data_investimento"] = None
 
     # Não sobrescreva vc_investidor se já existe valor
-    if not payload_dict.get("vc_investidor"):
-        payload_dict["vc_investidor"] = "Desconhecido"
-
-    if exists:
-        for field, value in payload_dict.items():
-            if value is not None:
-                setattr(exists, field, value)
-        exists.atualizado_em = datetime.utcnow()
-        session.commit()
-        session.refresh(exists)
-        return exists
-    s = models.Startup(**payload_dict, atualizado_em=datetime.utcnow())
-    session.add(s)
-    session.commit()
-    session.refresh(s)
-    return s
-
-@app.get('/api/startups')
-def list_startups(skip: int = 0, limit: int = 100, session: Session = Depends(db.get_session)):
-    items = session.query(models.Startup).offset(skip).limit(limit).all()
-    def serialize(item):
-        d = item.__dict__.copy()
-        d.pop('_sa_instance_state', None)
-        return d
-    result = [serialize(item) for item in items]
-    session.close()  # Fecha a sessão para liberar conexão
-    return result
\ No newline at end of file
+    if not data_dict.get("vc_investidor"):
+        data_dict["vc_investidor"] = "Desconhecido"
+    return data_dict
+
+def enrich_startups(session, nomes):
+    """Handler dos jobs: um prompt por lote de nomes, preenchendo só campos vazios"""
+    return enrichment.enrich_names(session, nomes, url=PERPLEXY_URL, headers=HEADERS)
+
+worker_pool = jobs.WorkerPool(enrich_startups)
+
+@app.on_event("startup")
+def start_workers():
+    worker_pool.start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    worker_pool.stop()
+
+@app.post("/api/startups", status_code=202, response_model=schemas.CreateStartupOut)
+async def create_startup(payload: StartupCreate, session: AsyncSession = Depends(db.get_async_session)):
+    # Grava o que veio no request na hora; o enriquecimento via LLM roda em background
+    def save(sync_session):
+        startup = crud.bulk_upsert_startups(sync_session, [normalize_startup(payload.dict())])[0]
+        return startup, jobs.serialize(jobs.enqueue(sync_session, payload.nome))
+
+    startup, job = await session.run_sync(save)
+    worker_pool.notify()
+    return {"job": job, "startup": startup}
+
+@app.get('/api/jobs/{job_id}', response_model=schemas.JobOut)
+async def get_job(job_id: int, session: AsyncSession = Depends(db.get_async_session)):
+    job = await session.get(models.EnrichmentJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job não encontrado")
+    return jobs.serialize(job)
+
+@app.get('/api/startups', response_model=List[schemas.StartupOut])
+async def list_startups(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    setor: Optional[str] = None,
+    localizacao: Optional[str] = None,
+    rodada: Optional[str] = None,
+    vc_investidor: Optional[str] = None,
+    data_de: Optional[date] = None,
+    data_ate: Optional[date] = None,
+    valor_min: Optional[float] = None,
+    valor_max: Optional[float] = None,
+    sort: str = "id",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    fields: Optional[str] = None,
+    session: AsyncSession = Depends(db.get_async_session),
+):
+    filters = {
+        "setor": setor,
+        "localizacao": localizacao,
+        "rodada": rodada,
+        "vc_investidor": vc_investidor,
+        "data_de": data_de,
+        "data_ate": data_ate,
+        "valor_min": valor_min,
+        "valor_max": valor_max,
+    }
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    def build(sync_session):
+        try:
+            result, next_cursor = crud.list_startups(
+                sync_session, filters=filters, sort=sort, desc=order == "desc", cursor=cursor,
+                limit=limit, fields=field_list, skip=skip,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        # O corpo continua sendo a lista; o cursor da próxima página vai no header
+        return result, {"X-Next-Cursor": next_cursor} if next_cursor else None
+
+    return await http_cache.cached_response(request, session, build, serializer=schemas.startups_json)
+
+@app.get('/api/startups/search', response_model=List[schemas.SearchHit])
+async def search_startups(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    session: AsyncSession = Depends(db.get_async_session),
+):
+    return await http_cache.cached_response(request, session, lambda s: (search.search(s, q, limit=limit), None), serializer=schemas.search_json)
+
+@app.get('/api/startups/export')
+async def export_startups(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    setor: Optional[str] = None,
+    localizacao: Optional[str] = None,
+    rodada: Optional[str] = None,
+    vc_investidor: Optional[str] = None,
+    data_de: Optional[date] = None,
+    data_ate: Optional[date] = None,
+    fields: Optional[str] = None,
+):
+    filters = {
+        "setor": setor,
+        "localizacao": localizacao,
+        "rodada": rodada,
+        "vc_investidor": vc_investidor,
+        "data_de": data_de,
+        "data_ate": data_ate,
+    }
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    try:
+        names = crud.resolve_fields(field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if format == "csv":
+        return StreamingResponse(
+            export.iter_csv(names, filters),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": "attachment; filename=startups.csv"},
+        )
+    return StreamingResponse(export.iter_ndjson(names, filters), media_type="application/x-ndjson")
+
+@app.get('/api/investidores', response_model=List[schemas.InvestidorOut])
+async def list_investidores(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(db.get_async_session),
+):
+    return await http_cache.cached_response(request, session, lambda s: (investidores.list_investidores(s, limit=limit), None), serializer=schemas.investidores_json)
+
+@app.get('/api/investidores/coinvestimentos', response_model=List[schemas.ParCoinvestimentoOut])
+async def coinvestimentos(
+    request: Request,
+    limit: int = Query(20, ge=1, le=200),
+    session: AsyncSession = Depends(db.get_async_session),
+):
+    return await http_cache.cached_response(request, session, lambda s: (investidores.coinvestimentos(s, limit=limit), None), serializer=schemas.coinvestimentos_json)
+
+@app.get('/api/investidores/{nome}/startups', response_model=List[schemas.StartupOut])
+async def investidor_portfolio(request: Request, nome: str, session: AsyncSession = Depends(db.get_async_session)):
+    def build(sync_session):
+        result = investidores.portfolio(sync_session, nome)
+        if result is None:
+            raise HTTPException(status_code=404, detail="investidor não encontrado")
+        return result, None
+
+    return await http_cache.cached_response(request, session, build, serializer=schemas.startups_json)
+
+@app.get('/api/investidores/{nome}/coinvestidores', response_model=List[schemas.CoinvestidorOut])
+async def investidor_coinvestidores(
+    request: Request,
+    nome: str,
+    limit: int = Query(20, ge=1, le=200),
+    session: AsyncSession = Depends(db.get_async_session),
+):
+    def build(sync_session):
+        result = investidores.coinvestidores(sync_session, nome, limit=limit)
+        if result is None:
+            raise HTTPException(status_code=404, detail="investidor não encontrado")
+        return result, None
+
+    return await http_cache.cached_response(request, session, build, serializer=schemas.coinvestidores_json)
+
+@app.get('/api/etl/runs')
+async def list_etl_runs(limit: int = Query(20, ge=1, le=200), session: AsyncSession = Depends(db.get_async_session)):
+    runs = (await session.execute(
+        select(models.EtlRun).order_by(models.EtlRun.id.desc()).limit(limit)
+    )).scalars().all()
+    return [{c.name: getattr(r, c.name) for c in models.EtlRun.__table__.columns} for r in runs]
+
+@app.get('/api/cache/stats')
+async def cache_stats():
+    return llm_cache.stats()
+
+@app.get('/api/db/pool')
+async def db_pool_stats():
+    return db.pool_snapshot()
+
+@metrics.register_collector
+def runtime_metrics():
+    pool_counters = ("connects", "checkouts", "checkins", "waits", "wait_seconds", "timeouts")
+    pool_gauges = ("size", "checkedout", "checkedin", "overflow")
+    pools = db.pool_snapshot()
+    result = []
+    for field in pool_counters:
+        result.append((f"db_pool_{field}_total", "counter", f"Pool de conexões: {field}",
+                       {(("engine", name),): snap[field] for name, snap in pools.items()}))
+    for field in pool_gauges:
+        samples = {(("engine", name),): snap[field] for name, snap in pools.items() if field in snap}
+        if samples:
+            result.append((f"db_pool_{field}", "gauge", f"Pool de conexões: {field}", samples))
+    for name, cache in (("llm", llm_cache.stats()), ("http", http_cache.response_cache.stats())):
+        result.append((f"{name}_cache_hits_total", "counter", f"Acertos do cache {name}", {(): cache["hits"]}))
+        result.append((f"{name}_cache_misses_total", "counter", f"Faltas do cache {name}", {(): cache["misses"]}))
+        result.append((f"{name}_cache_entries", "gauge", f"Entradas no cache {name}", {(): cache["entries"]}))
+    return result
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get('/api/stats', response_model=schemas.StatsSummary)
+async def stats_summary(request: Request, session: AsyncSession = Depends(db.get_async_session)):
+    # mês atual/anterior dependem do dia, não só dos dados
+    return await http_cache.cached_response(
+        request, session, lambda s: (stats.summary(s), None), vary=f"|{date.today().isoformat()}",
+        serializer=schemas.stats_summary_json,
+    )
+
+@app.get('/api/stats/{dimensao}', response_model=List[schemas.StatBucket])
+async def stats_facets(
+    request: Request,
+    dimensao: str,
+    limit: int = Query(100, ge=1, le=1000),
+    order: str = Query("total", pattern="^(total|valor|chave)$"),
+    session: AsyncSession = Depends(db.get_async_session),
+):
+    if dimensao not in stats.DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"dimensão desconhecida: {dimensao}")
+    return await http_cache.cached_response(
+        request, session, lambda s: (stats.facets(s, dimensao, limit=limit, order=order), None),
+        serializer=schemas.stat_buckets_json,
+    )
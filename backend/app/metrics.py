@@ -0,0 +1,225 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+
+# Log de requisições lentas (desligado com 0) e limite de SQL guardado por requisição
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {_format(value)}" if labels else f"{self.name} {_format(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = _labels(self.label_names, labels)
+                prefix = base + "," if base else ""
+                cumulative = 0
+                for bound, n in zip(self.buckets, series):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]}')
+                suffix = f"{{{base}}}" if base else ""
+                lines.append(f"{self.name}_sum{suffix} {_format(series[-2])}")
+                lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+http_requests = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota", ("method", "route", "status"))
+http_queries = Histogram(
+    "http_request_db_queries", "Comandos SQL emitidos por requisição", ("method", "route"), QUERY_COUNT_BUCKETS)
+http_query_seconds = Counter(
+    "http_request_db_seconds_total", "Tempo gasto em SQL pelas requisições", ("method", "route"))
+db_queries = Histogram("db_query_duration_seconds", "Duração de cada comando SQL", ("engine",))
+llm_requests = Histogram(
+    "llm_request_duration_seconds", "Latência das chamadas à API Perplexity", ("origem", "status"))
+llm_tokens = Counter("llm_tokens_total", "Tokens informados pela API Perplexity", ("origem", "tipo"))
+llm_retries = Counter("llm_retries_total", "Novas tentativas de chamadas à API Perplexity", ("origem",))
+etl_stages = Histogram("etl_stage_duration_seconds", "Duração das etapas do ETL", ("etapa",))
+enrichment_startups = Counter(
+    "enrichment_startups_total", "Startups processadas pelo enriquecimento em lote", ("resultado",))
+
+REGISTRY = [
+    http_requests, http_queries, http_query_seconds, db_queries, llm_requests, llm_tokens, llm_retries, etl_stages,
+    enrichment_startups,
+]
+
+# Coletores chamados a cada scrape: () -> [(nome, tipo, help, {labels: valor})]
+_collectors = []
+
+
+def register_collector(fn):
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    """Todas as métricas no formato texto do Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples.items():
+                label_str = _labels([k for k, _ in labels], [v for _, v in labels])
+                lines.append(f"{name}{{{label_str}}} {_format(value)}" if labels else f"{name} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.statements = [] if SLOW_REQUEST_MS else None
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def record_llm_call(origem, seconds, status, data=None):
+    """Latência e tokens de uma chamada ao LLM; `data` é o JSON da resposta, se houver"""
+    llm_requests.observe(seconds, origem, str(status))
+    usage = (data or {}).get("usage") or {}
+    for tipo in ("prompt_tokens", "completion_tokens"):
+        if usage.get(tipo):
+            llm_tokens.inc(origem, tipo, amount=usage[tipo])
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def instrument_engine(engine, name):
+    """Mede cada comando SQL do engine e soma na requisição em andamento"""
+
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("metrics_start")
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        db_queries.observe(elapsed, name)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+            if stats.statements is not None and len(stats.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+                stats.statements.append((elapsed, " ".join(statement.split())))
+
+    def on_error(context):
+        # comando que falhou não passa pelo after_cursor_execute
+        stack = context.connection.info.get("metrics_start") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", after_execute)
+    event.listen(engine, "handle_error", on_error)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência por rota, SQL por requisição e log de requisições lentas"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            # template da rota (/api/stats/{dimensao}) para não explodir a cardinalidade
+            route = getattr(scope.get("route"), "path", None) or "desconhecida"
+            method = scope["method"]
+            http_requests.observe(elapsed, method, route, status)
+            http_queries.observe(stats.queries, method, route)
+            http_query_seconds.inc(method, route, amount=stats.query_seconds)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                _log_slow(method, scope, status, elapsed, stats)
+
+
+def _log_slow(method, scope, status, elapsed, stats):
+    query = scope.get("query_string", b"").decode("latin-1")
+    path = scope["path"] + (f"?{query}" if query else "")
+    print(
+        f"Requisição lenta: {method} {path} -> {status} em {elapsed * 1000:.1f} ms, "
+        f"{stats.queries} consultas ({stats.query_seconds * 1000:.1f} ms em SQL)"
+    )
+    for seconds, statement in stats.statements or []:
+        print(f"  {seconds * 1000:8.1f} ms  {statement[:500]}")
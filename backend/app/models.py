@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, TIMESTAMP, Float, create_engine, MetaData
+from sqlalchemy import Column, Integer, String, Text, Date, TIMESTAMP, Float, ForeignKey, Index, Numeric, create_engine, MetaData, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -11,7 +11,8 @@ class Startup(Base):
     site = Column(String)
     setor = Column(String)
     ano_fundacao = Column(Integer)
-    valor_investimento = Column(String)
+    valor_investimento = Column(String)  # texto original, mantido para auditoria
+    valor_investimento_brl = Column(Numeric(20, 2))  # valor_investimento normalizado em reais
     rodada = Column(String)
     data_investimento = Column(Date)
     vc_investidor = Column(String)
@@ -19,6 +20,20 @@ class Startup(Base):
     linkedin_fundador = Column(String)
     localizacao = Column(String)
     atualizado_em = Column(TIMESTAMP)
+    conteudo_hash = Column(String(64))  # hash dos campos vindos do upstream, para detectar mudanças
+
+    __table_args__ = (
+        # alvo do ON CONFLICT no upsert em lote
+        Index("ux_startups_nome", "nome", unique=True),
+        # (coluna, id): filtros por igualdade e paginação por cursor em GET /api/startups
+        Index("ix_startups_setor_id", "setor", "id"),
+        Index("ix_startups_localizacao_id", "localizacao", "id"),
+        Index("ix_startups_rodada_id", "rodada", "id"),
+        Index("ix_startups_ano_fundacao_id", "ano_fundacao", "id"),
+        Index("ix_startups_data_investimento_id", "data_investimento", "id"),
+        Index("ix_startups_atualizado_em_id", "atualizado_em", "id"),
+        Index("ix_startups_valor_investimento_brl_id", "valor_investimento_brl", "id"),
+    )
 
 class Investidor(Base):
     __tablename__ = "investidores"
@@ -26,3 +41,101 @@ class Investidor(Base):
     nome = Column(String, nullable=False)
     origem = Column(String)
     setor_preferido = Column(String)
+
+    __table_args__ = (
+        # um investidor por nome; alvo do ON CONFLICT ao ligar startups
+        Index("ux_investidores_nome", "nome", unique=True),
+    )
+
+class StartupInvestidor(Base):
+    """Vínculo N:N entre startups e investidores, derivado de vc_investidor"""
+    __tablename__ = "startup_investidores"
+    startup_id = Column(Integer, ForeignKey("startups.id", ondelete="CASCADE"), primary_key=True)
+    investidor_id = Column(Integer, ForeignKey("investidores.id", ondelete="CASCADE"), primary_key=True)
+
+    __table_args__ = (
+        # a PK cobre startup -> investidores; este cobre portfólio e co-investimentos
+        Index("ix_startup_investidores_investidor_startup", "investidor_id", "startup_id"),
+    )
+
+class StartupStat(Base):
+    """Agregados por dimensão (setor, vc, mês...) mantidos a cada upsert de startups"""
+    __tablename__ = "startup_stats"
+    dimensao = Column(String, primary_key=True)
+    chave = Column(String, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    valor_total = Column(Float, nullable=False, default=0)
+
+class EnrichmentJob(Base):
+    """Fila durável de enriquecimento via LLM, consumida pelos workers da API"""
+    __tablename__ = "enrichment_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="pendente")  # pendente | executando | concluido | erro
+    tentativas = Column(Integer, nullable=False, default=0)
+    resultado = Column(Integer)  # startups gravadas pelo enriquecimento
+    erro = Column(Text)
+    criado_em = Column(TIMESTAMP)
+    atualizado_em = Column(TIMESTAMP)
+    disponivel_em = Column(TIMESTAMP)  # backoff: não é pego antes disso (NULL = já)
+
+    __table_args__ = (
+        Index("ix_enrichment_jobs_status_id", "status", "id"),
+        # no máximo um job ativo por startup
+        Index(
+            "ux_enrichment_jobs_nome_ativo", "nome", unique=True,
+            postgresql_where=text("status IN ('pendente', 'executando')"),
+            sqlite_where=text("status IN ('pendente', 'executando')"),
+        ),
+    )
+
+class EtlRun(Base):
+    """Uma execução do ETL e o que ela fez"""
+    __tablename__ = "etl_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    iniciado_em = Column(TIMESTAMP)
+    finalizado_em = Column(TIMESTAMP)
+    status = Column(String)  # executando | concluido | erro | interrompido
+    vcs_buscados = Column(Integer, default=0)
+    vcs_pulados = Column(Integer, default=0)
+    fetched = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    unchanged = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    quarentena = Column(Integer, default=0)  # linhas do CSV rejeitadas na validação
+    erro = Column(Text)
+    pendentes = Column(Text)  # JSON com os VCs ainda não gravados; checkpoint para retomar o run
+    retomado_de = Column(Integer)  # run interrompido cujos VCs pendentes este run assumiu
+
+class EtlWatermark(Base):
+    """Última busca bem-sucedida de cada VC; VCs recentes são pulados no próximo run"""
+    __tablename__ = "etl_watermarks"
+    vc = Column(String, primary_key=True)
+    ultimo_fetch = Column(TIMESTAMP)
+    linhas = Column(Integer)
+
+class EtlLock(Base):
+    """Trava entre processos para um único ETL por vez; expira se o dono morrer sem liberar"""
+    __tablename__ = "etl_locks"
+    nome = Column(String, primary_key=True)
+    dono = Column(String, nullable=False)
+    adquirido_em = Column(TIMESTAMP)
+    expira_em = Column(TIMESTAMP)
+
+class CsvQuarentena(Base):
+    """Linhas do CSV do LLM rejeitadas na validação, com o motivo"""
+    __tablename__ = "csv_quarentena"
+    id = Column(Integer, primary_key=True, index=True)
+    origem = Column(String)  # VC ou nome consultado
+    linha = Column(Integer)
+    conteudo = Column(Text)
+    motivo = Column(Text)
+    criado_em = Column(TIMESTAMP)
+
+class DataVersion(Base):
+    """Versão dos dados servidos pela API; muda a cada escrita em startups"""
+    __tablename__ = "data_versions"
+    nome = Column(String, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(TIMESTAMP)  # maior atualizado_em gravado em startups
@@ -1,5 +1,8 @@
-from datetime import date
-from pydantic import BaseModel, Field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Optional
+from typing_extensions import Annotated, Required, TypedDict
+from pydantic import BaseModel, Field, PlainSerializer, StringConstraints, TypeAdapter
 
 class StartupCreate(BaseModel):
     nome: str = Field(..., alias="Nome da Startup")
@@ -12,4 +15,107 @@ class StartupCreate(BaseModel):
     vc_investidor: str = Field(..., alias="VC Investidor")
     descricao_breve: str = Field(..., alias="Descrição Breve")
     linkedin_fundador: str = Field(..., alias="LinkedIn do Fundador")
-    localizacao: str = Field(..., alias="Localização (país)")
\ No newline at end of file
+    localizacao: str = Field(..., alias="Localização (país)")
+
+class StartupRowDict(TypedDict, total=False):
+    """Linha já mapeada do CSV do LLM; validada em lote por app.llm_csv"""
+    nome: Required[Annotated[str, StringConstraints(min_length=1)]]
+    site: Optional[str]
+    setor: Optional[str]
+    ano_fundacao: Optional[int]
+    valor_investimento: Optional[str]
+    rodada: Optional[str]
+    data_investimento: Optional[date]
+    vc_investidor: Optional[str]
+    descricao_breve: Optional[str]
+    linkedin_fundador: Optional[str]
+    localizacao: Optional[str]
+
+# Respostas da API. TypedDicts com total=False porque `fields=` pode omitir colunas;
+# serializadas direto para bytes JSON pelo pydantic, sem jsonable_encoder
+
+# Numeric sai como número no JSON, como antes
+Money = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+
+class StartupOut(TypedDict, total=False):
+    id: int
+    nome: str
+    site: Optional[str]
+    setor: Optional[str]
+    ano_fundacao: Optional[int]
+    valor_investimento: Optional[str]
+    valor_investimento_brl: Optional[Money]
+    rodada: Optional[str]
+    data_investimento: Optional[date]
+    vc_investidor: Optional[str]
+    descricao_breve: Optional[str]
+    linkedin_fundador: Optional[str]
+    localizacao: Optional[str]
+    atualizado_em: Optional[datetime]
+    conteudo_hash: Optional[str]
+
+class SearchHit(TypedDict):
+    id: int
+    nome: str
+    setor: Optional[str]
+    descricao_breve: Optional[str]
+    vc_investidor: Optional[str]
+    localizacao: Optional[str]
+    score: Optional[float]
+
+class JobOut(TypedDict):
+    id: int
+    nome: str
+    status: str
+    tentativas: int
+    resultado: Optional[int]
+    erro: Optional[str]
+    criado_em: Optional[datetime]
+    atualizado_em: Optional[datetime]
+
+class CreateStartupOut(TypedDict):
+    job: JobOut
+    startup: StartupOut
+
+class InvestidorOut(TypedDict):
+    id: int
+    nome: str
+    origem: Optional[str]
+    setor_preferido: Optional[str]
+    startups: int
+    investido: Money
+
+class CoinvestidorOut(TypedDict):
+    id: int
+    nome: str
+    startups_em_comum: int
+
+class ParCoinvestimentoOut(TypedDict):
+    investidor_a: str
+    investidor_b: str
+    startups_em_comum: int
+
+class StatBucket(TypedDict):
+    chave: str
+    startups: int
+    investido: float
+
+class MesResumo(TypedDict):
+    mes: str
+    startups: int
+    investido: float
+
+class StatsSummary(TypedDict):
+    total_startups: int
+    total_investido: float
+    total_investidores: int
+    mes_atual: MesResumo
+    mes_anterior: MesResumo
+
+startups_json = TypeAdapter(List[StartupOut])
+search_json = TypeAdapter(List[SearchHit])
+investidores_json = TypeAdapter(List[InvestidorOut])
+coinvestidores_json = TypeAdapter(List[CoinvestidorOut])
+coinvestimentos_json = TypeAdapter(List[ParCoinvestimentoOut])
+stat_buckets_json = TypeAdapter(List[StatBucket])
+stats_summary_json = TypeAdapter(StatsSummary)
@@ -0,0 +1,114 @@
+import re
+from sqlalchemy import or_, select, text
+from .models import Startup
+
+# Colunas indexadas para busca, em ordem de relevância
+SEARCH_COLUMNS = ["nome", "setor", "descricao_breve", "vc_investidor"]
+
+# Documento usado pelo índice GIN; a consulta precisa repetir exatamente a mesma expressão
+PG_DOCUMENT = (
+    "to_tsvector('portuguese', coalesce(nome, '') || ' ' || coalesce(setor, '') || ' ' "
+    "|| coalesce(descricao_breve, '') || ' ' || coalesce(vc_investidor, ''))"
+)
+
+PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_startups_busca_fts ON startups USING GIN ({PG_DOCUMENT})",
+    "CREATE INDEX IF NOT EXISTS ix_startups_nome_trgm ON startups USING GIN (nome gin_trgm_ops)",
+]
+
+# FTS5 com conteúdo externo; os triggers mantêm o índice em dia a cada INSERT/UPDATE/DELETE
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS startups_fts USING fts5(
+        nome, setor, descricao_breve, vc_investidor,
+        content='startups', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS startups_fts_ai AFTER INSERT ON startups BEGIN
+        INSERT INTO startups_fts(rowid, nome, setor, descricao_breve, vc_investidor)
+        VALUES (new.id, new.nome, new.setor, new.descricao_breve, new.vc_investidor);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS startups_fts_ad AFTER DELETE ON startups BEGIN
+        INSERT INTO startups_fts(startups_fts, rowid, nome, setor, descricao_breve, vc_investidor)
+        VALUES ('delete', old.id, old.nome, old.setor, old.descricao_breve, old.vc_investidor);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS startups_fts_au AFTER UPDATE ON startups BEGIN
+        INSERT INTO startups_fts(startups_fts, rowid, nome, setor, descricao_breve, vc_investidor)
+        VALUES ('delete', old.id, old.nome, old.setor, old.descricao_breve, old.vc_investidor);
+        INSERT INTO startups_fts(rowid, nome, setor, descricao_breve, vc_investidor)
+        VALUES (new.id, new.nome, new.setor, new.descricao_breve, new.vc_investidor);
+    END""",
+    "INSERT INTO startups_fts(startups_fts) VALUES ('rebuild')",
+]
+
+# Colunas devolvidas pela busca
+RESULT_COLUMNS = ["id", "nome", "setor", "descricao_breve", "vc_investidor", "localizacao"]
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(engine):
+    """Cria os índices de busca do dialeto (idempotente)"""
+    dialect = engine.dialect.name
+    statements = PG_DDL if dialect == "postgresql" else SQLITE_DDL if dialect == "sqlite" else []
+    with engine.begin() as conn:
+        for ddl in statements:
+            conn.execute(text(ddl))
+
+
+def _fts5_query(q):
+    # cada termo vira prefixo entre aspas: sem operadores FTS5 vindos do usuário
+    return " ".join(f'"{w}"*' for w in _WORD.findall(q))
+
+
+def _search_postgresql(session, q, limit):
+    cols = ", ".join(RESULT_COLUMNS)
+    stmt = text(f"""
+        SELECT {cols},
+               ts_rank({PG_DOCUMENT}, websearch_to_tsquery('portuguese', :q)) + similarity(nome, :q) AS score
+        FROM startups
+        WHERE {PG_DOCUMENT} @@ websearch_to_tsquery('portuguese', :q) OR nome % :q
+        ORDER BY score DESC, id
+        LIMIT :limit
+    """)
+    return [dict(r._mapping) for r in session.execute(stmt, {"q": q, "limit": limit})]
+
+
+def _search_sqlite(session, q, limit):
+    match = _fts5_query(q)
+    if not match:
+        return []
+    cols = ", ".join(f"s.{c}" for c in RESULT_COLUMNS)
+    # bm25 é menor quanto melhor; pesos favorecem nome > setor > descrição > VC
+    stmt = text(f"""
+        SELECT {cols}, -bm25(startups_fts, 10.0, 4.0, 1.0, 2.0) AS score
+        FROM startups_fts JOIN startups s ON s.id = startups_fts.rowid
+        WHERE startups_fts MATCH :match
+        ORDER BY score DESC, s.id
+        LIMIT :limit
+    """)
+    return [dict(r._mapping) for r in session.execute(stmt, {"match": match, "limit": limit})]
+
+
+def _search_like(session, q, limit):
+    table = Startup.__table__
+    pattern = f"%{q}%"
+    stmt = (
+        select(*[table.c[c] for c in RESULT_COLUMNS])
+        .where(or_(*[table.c[c].ilike(pattern) for c in SEARCH_COLUMNS]))
+        .order_by(table.c.id)
+        .limit(limit)
+    )
+    return [{**dict(r._mapping), "score": None} for r in session.execute(stmt)]
+
+
+def search(session, q, limit=20):
+    """Busca ranqueada por nome, setor, descrição e VC"""
+    q = q.strip()
+    if not q:
+        return []
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return _search_postgresql(session, q, limit)
+    if dialect == "sqlite":
+        return _search_sqlite(session, q, limit)
+    return _search_like(session, q, limit)
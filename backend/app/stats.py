@@ -0,0 +1,158 @@
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from . import versao
+from .investidores import split_names
+from .models import Startup, StartupStat
+
+# Dimensões disponíveis em /api/stats/{dimensao}
+DIMENSIONS = ["setor", "localizacao", "rodada", "vc", "mes", "ano_fundacao"]
+
+# Colunas de startups que alimentam os agregados
+STAT_COLUMNS = ["nome", "setor", "localizacao", "rodada", "vc_investidor", "data_investimento", "ano_fundacao", "valor_investimento_brl"]
+
+
+def _month(value):
+    if isinstance(value, date):
+        return value.strftime("%Y-%m")
+    if isinstance(value, str) and len(value) >= 7:
+        return value[:7]
+    return None
+
+
+def contributions(row):
+    """Buckets (dimensao, chave) em que uma startup é contada"""
+    keys = [
+        ("geral", "total"),
+        ("setor", row.get("setor")),
+        ("localizacao", row.get("localizacao")),
+        ("rodada", row.get("rodada")),
+        ("mes", _month(row.get("data_investimento"))),
+        ("ano_fundacao", str(row["ano_fundacao"]) if row.get("ano_fundacao") is not None else None),
+    ]
+    # mesmos nomes de /api/investidores: sem 'Desconhecido' e afins
+    keys.extend(("vc", v) for v in sorted(split_names(row.get("vc_investidor"))))
+    return [(d, k if k not in (None, "") else "Desconhecido") for d, k in keys]
+
+
+def _accumulate(acc, rows, sign):
+    for row in rows:
+        valor = float(row.get("valor_investimento_brl") or 0)
+        for key in contributions(row):
+            acc[key][0] += sign
+            acc[key][1] += sign * valor
+
+
+def fetch_current(session, nomes):
+    """Estado atual das startups do lote, lido antes do upsert para calcular o delta"""
+    if not nomes:
+        return []
+    table = Startup.__table__
+    stmt = select(*[table.c[c] for c in STAT_COLUMNS]).where(table.c.nome.in_(nomes))
+    return [dict(r._mapping) for r in session.execute(stmt)]
+
+
+def _increment(session, rows):
+    table = StartupStat.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert_fn = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert_fn(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.dimensao, table.c.chave],
+            set_={
+                "total": table.c.total + stmt.excluded.total,
+                "valor_total": table.c.valor_total + stmt.excluded.valor_total,
+            },
+        )
+        session.execute(stmt)
+        return
+    for r in rows:
+        updated = session.execute(
+            table.update()
+            .where(table.c.dimensao == r["dimensao"], table.c.chave == r["chave"])
+            .values(total=table.c.total + r["total"], valor_total=table.c.valor_total + r["valor_total"])
+        )
+        if not updated.rowcount:
+            session.execute(table.insert().values(**r))
+
+
+def apply_delta(session, old_rows, new_rows):
+    """Atualiza startup_stats só com a diferença entre o estado antigo e o novo do lote"""
+    acc = defaultdict(lambda: [0, 0.0])
+    _accumulate(acc, old_rows, -1)
+    _accumulate(acc, new_rows, 1)
+    # ordem fixa por (dimensao, chave): o upsert trava as linhas nessa ordem e
+    # escritores concorrentes (setor A->B e B->A) não se bloqueiam em ciclo
+    rows = [
+        {"dimensao": d, "chave": k, "total": c, "valor_total": v}
+        for (d, k), (c, v) in sorted(acc.items()) if c or v
+    ]
+    if not rows:
+        return
+    _increment(session, rows)
+    keys = [(r["dimensao"], r["chave"]) for r in rows]
+    session.execute(
+        delete(StartupStat)
+        .where(tuple_(StartupStat.dimensao, StartupStat.chave).in_(keys), StartupStat.total <= 0)
+    )
+
+
+def rebuild(session, commit=True):
+    """Recalcula a tabela inteira a partir de startups (backfill ou correção)"""
+    table = Startup.__table__
+    acc = defaultdict(lambda: [0, 0.0])
+    result = session.execute(
+        select(*[table.c[c] for c in STAT_COLUMNS]).execution_options(yield_per=1000)
+    )
+    for chunk in result.partitions():
+        _accumulate(acc, [dict(r._mapping) for r in chunk], 1)
+    session.execute(delete(StartupStat))
+    rows = [{"dimensao": d, "chave": k, "total": c, "valor_total": v} for (d, k), (c, v) in acc.items()]
+    if rows:
+        session.execute(StartupStat.__table__.insert(), rows)
+    # stats servidos pela API mudaram: invalida ETags
+    versao.bump(session, datetime.utcnow())
+    if commit:
+        session.commit()
+    return len(rows)
+
+
+def _bucket(session, dimensao, chave):
+    row = session.get(StartupStat, (dimensao, chave))
+    return {"startups": row.total if row else 0, "investido": row.valor_total if row else 0.0}
+
+
+def summary(session, today=None):
+    """KPIs do dashboard: totais gerais e mês atual vs. anterior (por data de investimento)"""
+    today = today or date.today()
+    this_month = today.strftime("%Y-%m")
+    last = date(today.year - 1, 12, 1) if today.month == 1 else date(today.year, today.month - 1, 1)
+    geral = _bucket(session, "geral", "total")
+    investidores = session.execute(
+        select(func.count()).select_from(StartupStat).where(StartupStat.dimensao == "vc")
+    ).scalar()
+    return {
+        "total_startups": geral["startups"],
+        "total_investido": geral["investido"],
+        "total_investidores": investidores,
+        "mes_atual": {"mes": this_month, **_bucket(session, "mes", this_month)},
+        "mes_anterior": {"mes": last.strftime("%Y-%m"), **_bucket(session, "mes", last.strftime("%Y-%m"))},
+    }
+
+
+def facets(session, dimensao, limit=100, order="total"):
+    """Buckets de uma dimensão ordenados por contagem, valor ou chave"""
+    column = {
+        "total": StartupStat.total.desc(),
+        "valor": StartupStat.valor_total.desc(),
+        "chave": StartupStat.chave.asc(),
+    }[order]
+    stmt = (
+        select(StartupStat.chave, StartupStat.total, StartupStat.valor_total)
+        .where(StartupStat.dimensao == dimensao)
+        .order_by(column, StartupStat.chave)
+        .limit(limit)
+    )
+    return [{"chave": c, "startups": t, "investido": v} for c, t, v in session.execute(stmt)]
@@ -0,0 +1,135 @@
+import os
+import re
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import bindparam, select
+from . import versao
+from .models import Startup
+
+# Cotação usada para converter valores em dólar (mesma premissa do frontend)
+USD_BRL = float(os.getenv("USD_BRL", "5"))
+
+_NUMBER = re.compile(r"\d[\d.,]*")
+# número logo após a moeda vence anos e outros números soltos ('2021: R$ 5 milhões')
+_AMOUNT = re.compile(r"(?:R\$|US\$|USD|\$)\s*(\d[\d.,]*)")
+# só o termo logo após o número: 'R$ 50 milhões (Série B)' não vira bilhão
+_MULTIPLIERS = [
+    (re.compile(r"\s*(BI|BILH\w*|BILLIONS?|BN|B)\b"), 1_000_000_000),
+    (re.compile(r"\s*(MI|MM|MILH\w*|MILLIONS?|M)\b"), 1_000_000),
+    (re.compile(r"\s*(MIL|THOUSANDS?|K)\b"), 1_000),
+]
+_USD = re.compile(r"US\$|\bUSD\b|^\$|D[OÓ]LAR|DOLLAR")
+
+
+def _to_float(number):
+    """Interpreta separadores no padrão brasileiro, aceitando também o americano"""
+    if "." in number and "," in number:
+        if number.rfind(",") > number.rfind("."):
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif "," in number:
+        head, _, tail = number.rpartition(",")
+        if number.count(",") > 1 or len(tail) == 3:
+            number = number.replace(",", "")
+        else:
+            number = head + "." + tail
+    elif "." in number:
+        tail = number.rpartition(".")[2]
+        if number.count(".") > 1 or len(tail) == 3:
+            number = number.replace(".", "")
+    return float(number)
+
+
+def parse_valor(value):
+    """Converte textos como '5.000.000', 'R$ 2,5 mi', 'US$ 10M' ou '10 milhões de dólares' em reais; None se não der"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = value.upper().strip()
+    match = _AMOUNT.search(text)
+    group = 1
+    if not match:
+        match, group = _NUMBER.search(text), 0
+    if not match:
+        return None
+    try:
+        number = _to_float(match.group(group).rstrip(".,"))
+    except ValueError:
+        return None
+    rest = text[match.end(group):]
+    for pattern, multiplier in _MULTIPLIERS:
+        if pattern.match(rest):
+            number *= multiplier
+            break
+    if _USD.search(text):
+        number *= USD_BRL
+    return number
+
+
+def parse_valores(values):
+    """Versão em lote de parse_valor.
+
+    Os textos vindos do LLM se repetem muito ('Desconhecido', '5.000.000'...),
+    então cada valor distinto é interpretado uma única vez por lote. Retorna
+    Decimal com 2 casas, pronto para a coluna numérica.
+    """
+    parsed = {}
+    out = []
+    for value in values:
+        key = value.strip() if isinstance(value, str) else value
+        if key not in parsed:
+            number = parse_valor(key)
+            parsed[key] = Decimal(str(round(number, 2))) if number is not None else None
+        out.append(parsed[key])
+    return out
+
+
+def backfill(session, batch_size=1000, recompute=False):
+    """Preenche valor_investimento_brl nas linhas antigas, em lotes por id.
+
+    Com `recompute`, reinterpreta também as linhas já preenchidas (após
+    mudanças em parse_valor).
+    """
+    table = Startup.__table__
+    last_id, updated = 0, 0
+    while True:
+        stmt = select(table.c.id, table.c.valor_investimento).where(
+            table.c.id > last_id, table.c.valor_investimento.is_not(None)
+        )
+        if not recompute:
+            stmt = stmt.where(table.c.valor_investimento_brl.is_(None))
+        rows = session.execute(stmt.order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        params = [
+            {"b_id": r.id, "b_valor": v}
+            for r, v in zip(rows, parse_valores([r.valor_investimento for r in rows]))
+            if v is not None
+        ]
+        if params:
+            session.execute(
+                table.update().where(table.c.id == bindparam("b_id")).values(valor_investimento_brl=bindparam("b_valor")),
+                params,
+            )
+            updated += len(params)
+            # valores servidos pela API mudaram: invalida ETags
+            versao.bump(session, datetime.utcnow())
+        session.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    import sys
+    from . import stats
+    from .db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        updated = backfill(session, recompute="--todos" in sys.argv)
+        print(f"valor_investimento_brl preenchido em {updated} startups.")
+        stats.rebuild(session)
+    finally:
+        session.close()
@@ -0,0 +1,25 @@
+from sqlalchemy import select
+from .models import DataVersion
+
+# Um contador para tudo que deriva de startups (listagem, stats, investidores, busca)
+STARTUPS = "startups"
+
+
+def bump(session, atualizado_em, nome=STARTUPS):
+    """Incrementa a versão na mesma transação da escrita"""
+    table = DataVersion.__table__
+    updated = session.execute(
+        table.update()
+        .where(table.c.nome == nome)
+        .values(versao=table.c.versao + 1, atualizado_em=atualizado_em)
+    )
+    if not updated.rowcount:
+        session.execute(table.insert().values(nome=nome, versao=1, atualizado_em=atualizado_em))
+
+
+def current(session, nome=STARTUPS):
+    """(versão, último atualizado_em); (0, None) antes da primeira escrita"""
+    row = session.execute(
+        select(DataVersion.versao, DataVersion.atualizado_em).where(DataVersion.nome == nome)
+    ).first()
+    return (row.versao, row.atualizado_em) if row else (0, None)
@@ -0,0 +1,90 @@
+"""Microbenchmark do parser de CSV do LLM: fluxo antigo linha a linha vs. app.llm_csv.
+
+Uso (dentro de backend/):  python -m bench.bench_llm_csv [linhas]
+Imprime um JSON com tempo e linhas/s de cada abordagem.
+"""
+import csv
+import gc
+import io
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from app import schemas
+from app.llm_csv import parse_startups_csv
+
+HEADER = (
+    "Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; "
+    "Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)"
+)
+
+
+def synthetic_csv(n, seed=42):
+    rnd = random.Random(seed)
+    lines = ["```csv", HEADER]
+    for i in range(n):
+        day = f"{rnd.randint(2015, 2024)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"
+        lines.append("; ".join([
+            f"Startup {i}", f"www.startup{i}.com", rnd.choice(["Fintech", "Healthtech", "Edtech"]),
+            str(rnd.randint(2000, 2023)), rnd.choice(["5.000.000", "R$ 2,5 mi", "Desconhecido"]),
+            rnd.choice(["Seed", "Série A", "Série B"]), day, rnd.choice(["Kaszek", "['Kaszek', 'QED']"]),
+            "Plataforma de pagamentos digitais", f"linkedin.com/in/fundador{i}", "Brasil",
+        ]))
+    lines.append("```")
+    return "\n".join(lines)
+
+
+def legacy_parse(csv_text):
+    # Cópia do fluxo antigo de main.fetch_startup_data, para comparação
+    csv_text = csv_text.replace("```csv", "").replace("```", "").strip()
+    rows = list(csv.DictReader(io.StringIO(csv_text), delimiter=";"))
+    startups = []
+    for row in rows:
+        row_clean = {k.strip(): v.strip() if isinstance(v, str) else v for k, v in row.items()}
+        vc_raw = row_clean.get("VC Investidor")
+        if vc_raw and vc_raw.startswith("["):
+            vc_raw = vc_raw.replace("[", "").replace("]", "").replace("'", "").strip()
+            row_clean["VC Investidor"] = ", ".join([v.strip() for v in vc_raw.split(",")])
+        data_raw = row_clean.get("Data do Investimento")
+        if data_raw:
+            for fmt in ("%Y-%m-%d", "%Y-%m", "%d/%m/%Y"):
+                try:
+                    row_clean["Data do Investimento"] = datetime.strptime(data_raw, fmt).date()
+                    break
+                except ValueError:
+                    row_clean["Data do Investimento"] = None
+        try:
+            startups.append(schemas.StartupCreate.model_validate(row_clean).model_dump())
+        except Exception:
+            pass
+    return startups
+
+
+def measure(fn, text, repeat=3):
+    # melhor de `repeat` execuções, para reduzir ruído da máquina
+    elapsed, count = float("inf"), 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rows = fn(text)
+        elapsed = min(elapsed, time.perf_counter() - start)
+        count = len(rows.rows) if hasattr(rows, "rows") else len(rows)
+        del rows
+    return {"segundos": round(elapsed, 4), "linhas": count, "linhas_por_segundo": round(count / elapsed)}
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    text = synthetic_csv(n)
+    result = {
+        "linhas_geradas": n,
+        "legado": measure(legacy_parse, text),
+        "llm_csv": measure(parse_startups_csv, text),
+    }
+    result["ganho"] = round(result["legado"]["segundos"] / result["llm_csv"]["segundos"], 2)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
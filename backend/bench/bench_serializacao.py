@@ -0,0 +1,93 @@
+"""Microbenchmark de uma página de GET /api/startups: ORM + jsonable_encoder vs. Core + TypeAdapter.
+
+Uso (dentro de backend/, com DATABASE_URL apontando para um banco descartável):
+    python -m bench.bench_serializacao [linhas_por_pagina]
+Popula o banco com bench.seed se houver menos linhas que a página. Imprime um
+JSON com tempo e linhas/s de cada caminho, separando consulta e serialização.
+"""
+import gc
+import json
+import sys
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select
+from app import crud, schemas, search
+from app.db import SessionLocal, engine
+from app.models import Base, Startup
+from bench.seed import seed
+
+
+def legacy_page(session, limit):
+    # Fluxo antigo do list_startups: instâncias ORM, __dict__ sem _sa_instance_state, jsonable_encoder
+    items = session.query(Startup).order_by(Startup.id).limit(limit).all()
+    rows = []
+    for item in items:
+        row = dict(item.__dict__)
+        row.pop("_sa_instance_state", None)
+        rows.append(row)
+    session.expunge_all()
+    return rows
+
+
+def legacy_encode(rows):
+    return JSONResponse(jsonable_encoder(rows)).body
+
+
+def core_page(session, limit):
+    return crud.list_startups(session, limit=limit)[0]
+
+
+def core_encode(rows):
+    return schemas.startups_json.dump_json(rows)
+
+
+def measure(session, fetch, encode, limit, repeat=3):
+    # melhor de `repeat` execuções, para reduzir ruído da máquina
+    best = {"consulta": float("inf"), "serializacao": float("inf")}
+    size = 0
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rows = fetch(session, limit)
+        fetched = time.perf_counter()
+        body = encode(rows)
+        done = time.perf_counter()
+        best["consulta"] = min(best["consulta"], fetched - start)
+        best["serializacao"] = min(best["serializacao"], done - fetched)
+        count, size = len(rows), len(body)
+        del rows, body
+    total = best["consulta"] + best["serializacao"]
+    return {
+        "linhas": count,
+        "bytes": size,
+        "consulta_s": round(best["consulta"], 4),
+        "serializacao_s": round(best["serializacao"], 4),
+        "total_s": round(total, 4),
+        "linhas_por_segundo": round(count / total),
+    }
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    # banco novo: cria as tabelas antes de contar as linhas existentes
+    Base.metadata.create_all(bind=engine)
+    search.ensure_search_index(engine)
+    session = SessionLocal()
+    try:
+        existing = session.execute(select(func.count()).select_from(Startup)).scalar()
+        if existing < limit:
+            seed(limit - existing, start=existing)
+        result = {
+            "linhas_por_pagina": limit,
+            "legado": measure(session, legacy_page, legacy_encode, limit),
+            "core_typeadapter": measure(session, core_page, core_encode, limit),
+        }
+    finally:
+        session.close()
+    result["ganho"] = round(result["legado"]["total_s"] / result["core_typeadapter"]["total_s"], 2)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
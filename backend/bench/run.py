@@ -0,0 +1,291 @@
+"""Benchmark de carga da API e do ETL contra um stub local da Perplexity.
+
+Uso (dentro de backend/, com DATABASE_URL apontando para um banco descartável):
+    python -m bench.run --seed 100000 --requests 2000 --concurrency 32 --out bench-100k.json
+    python -m bench.run --requests 2000 --baseline bench-100k.json
+
+Cada cenário reporta latência p50/p95/p99, throughput, consultas SQL por
+requisição e o pico de RSS do processo, em JSON. Com --baseline, inclui a
+variação percentual de cada métrica em relação a um relatório anterior.
+Sem --url a API roda no mesmo processo (ASGI), o que permite contar as
+consultas; com --url, mede um servidor já em execução.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from itertools import count
+
+from bench import stub_perplexity
+
+LIST_URLS = [
+    "/api/startups?limit=100",
+    "/api/startups?limit=100&setor=Fintech",
+    "/api/startups?limit=50&sort=valor_investimento_brl&order=desc",
+    "/api/startups?limit=100&vc_investidor=Kaszek&fields=nome,setor,vc_investidor",
+]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB; macOS, bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class QueryCounter:
+    """Conta comandos SQL emitidos por um engine via eventos do SQLAlchemy"""
+
+    def __init__(self, *engines):
+        from sqlalchemy import event
+        self.total = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.total += 1
+
+
+def summarize(latencies, errors, elapsed, queries=None):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    return {
+        "requisicoes": n,
+        "erros": errors,
+        "segundos": round(elapsed, 3),
+        "throughput_rps": round(n / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if n else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if n else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if n else None,
+        "consultas_por_requisicao": round(queries / n, 2) if queries is not None and n else None,
+        "rss_pico_mb": peak_rss_mb(),
+    }
+
+
+async def drive(client, requests, concurrency):
+    """Dispara `requests` (lista de (método, url, kwargs)) com no máximo `concurrency` em voo"""
+    sem = asyncio.Semaphore(concurrency)
+    latencies, errors, statuses = [], 0, {}
+
+    async def one(method, url, kwargs):
+        nonlocal errors
+        async with sem:
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kwargs)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(*req) for req in requests))
+    return latencies, errors, time.perf_counter() - start, statuses
+
+
+async def run_api(args, app, counter):
+    import httpx
+    from app import http_cache
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+    async def scenario(name, requests):
+        before = counter.total if counter else None
+        latencies, errors, elapsed, statuses = await drive(client, requests, args.concurrency)
+        queries = counter.total - before if counter else None
+        result = summarize(latencies, errors, elapsed, queries)
+        result["status"] = {str(k): v for k, v in sorted(statuses.items())}
+        report[name] = result
+        print(f"  {name}: p95 {result['p95_ms']} ms, {result['throughput_rps']} req/s", file=sys.stderr)
+
+    report = {}
+    gets = [("GET", LIST_URLS[i % len(LIST_URLS)], {}) for i in range(args.requests)]
+    async with client:
+        # sem cache de respostas: toda requisição vai ao banco
+        max_entries = http_cache.response_cache.max_entries
+        http_cache.response_cache.max_entries = 0
+        http_cache.response_cache.clear()
+        await scenario("get_startups_sem_cache", gets)
+        http_cache.response_cache.max_entries = max_entries
+
+        await scenario("get_startups", gets)
+
+        # cliente que já tem a versão atual: só a consulta da versão, sem corpo
+        etags = {}
+        for url in LIST_URLS:
+            etags[url] = (await client.get(url)).headers.get("etag")
+        conditional = [("GET", url, {"headers": {"If-None-Match": etags[url]}} if etags[url] else {}) for _, url, _ in gets]
+        await scenario("get_startups_304", conditional)
+
+        ids = count()
+        posts = [
+            ("POST", "/api/startups", {"json": {
+                "nome": f"Bench Post {time.time_ns()}-{next(ids)}", "site": "www.bench.com", "setor": "Fintech",
+                "ano_fundacao": 2020, "valor_investimento": "1.000.000", "rodada": "Seed",
+                "data_investimento": "2024-01-15", "vc_investidor": "Kaszek", "descricao_breve": "Bench",
+                "linkedin_fundador": "linkedin.com/in/bench", "localizacao": "Brasil",
+            }})
+            for _ in range(args.posts)
+        ]
+        await scenario("post_startups", posts)
+    return report
+
+
+def wait_jobs(timeout):
+    """Espera a fila de enriquecimento esvaziar; retorna (segundos, pendentes)"""
+    from sqlalchemy import func, select
+    from app.db import SessionLocal
+    from app.models import EnrichmentJob
+
+    start = time.perf_counter()
+    while True:
+        session = SessionLocal()
+        try:
+            pending = session.execute(
+                select(func.count()).select_from(EnrichmentJob).where(EnrichmentJob.status.in_(("pendente", "executando")))
+            ).scalar()
+        finally:
+            session.close()
+        elapsed = time.perf_counter() - start
+        if not pending or elapsed > timeout:
+            return round(elapsed, 3), pending
+        time.sleep(0.1)
+
+
+def run_etl(args, stub_url, counter):
+    from etl.async_fetch import AsyncFetcher
+    from etl.fetch_and_load import HEADERS, run_incremental
+
+    vcs = [f"Bench VC {i}" for i in range(args.vcs)]
+    report = {}
+    # 1ª passada insere; 2ª recebe as mesmas respostas e não deve reescrever nada
+    for name in ("etl_carga", "etl_incremental"):
+        fetcher = AsyncFetcher(stub_url, headers=HEADERS, concurrency=args.concurrency, rate_per_host=0,
+                               max_retries=3, cache=None)
+        before = counter.total if counter else None
+        start = time.perf_counter()
+        run = run_incremental(vcs, force=True, fetcher=fetcher)
+        elapsed = time.perf_counter() - start
+        report[name] = {
+            "vcs": len(vcs),
+            "segundos": round(elapsed, 3),
+            "linhas_por_segundo": round(run["fetched"] / elapsed, 1) if elapsed else None,
+            "consultas": counter.total - before if counter else None,
+            "rss_pico_mb": peak_rss_mb(),
+            **{k: run[k] for k in ("status", "fetched", "inserted", "updated", "unchanged", "failed", "quarentena", "etapas")},
+        }
+        print(f"  {name}: {report[name]['segundos']} s, {report[name]['fetched']} linhas", file=sys.stderr)
+    return report
+
+
+def compare(current, baseline):
+    """Variação percentual de cada métrica numérica em relação ao baseline"""
+    delta = {}
+    for scenario, metrics in current.items():
+        old = baseline.get(scenario) or {}
+        for metric, value in metrics.items():
+            before = old.get(metric)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and before:
+                delta.setdefault(scenario, {})[metric] = round((value - before) / before * 100, 1)
+    return delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0, help="recria a base com N startups (ex.: 1000, 100000, 1000000)")
+    parser.add_argument("--requests", type=int, default=1000, help="GETs por cenário")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--vcs", type=int, default=20, help="VCs buscados no cenário de ETL")
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--stub-jitter", type=float, default=0.05)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-rows", type=int, default=50, help="startups por resposta do stub")
+    parser.add_argument("--url", help="mede um servidor já em execução em vez da API em processo")
+    parser.add_argument("--skip-etl", action="store_true")
+    parser.add_argument("--jobs-timeout", type=float, default=120)
+    parser.add_argument("--baseline", help="relatório JSON anterior para comparação")
+    parser.add_argument("--out", help="arquivo de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    server, stub, stub_url = stub_perplexity.start(
+        latency=args.stub_latency, jitter=args.stub_jitter, error_rate=args.stub_error_rate, rows=args.stub_rows,
+    )
+    # a API e o ETL leem o endpoint e a chave no import
+    os.environ["PERPLEXY_URL"] = stub_url
+    os.environ.setdefault("PERPLEXY_API_KEY", "bench")
+
+    from bench.seed import seed
+    from app import db
+
+    report = {
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "banco": db.engine.dialect.name,
+            "alvo": args.url or "asgi",
+        },
+        "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "out")},
+        "cenarios": {},
+    }
+    if args.seed:
+        print(f"Populando {args.seed} startups...", file=sys.stderr)
+        report["cenarios"]["seed"] = {"linhas": args.seed, "linhas_por_segundo": round(seed(args.seed, do_reset=True), 1)}
+
+    # a API usa o engine assíncrono; workers de enriquecimento e ETL, o síncrono
+    api_counter = None if args.url else QueryCounter(db.async_engine.sync_engine)
+    etl_counter = QueryCounter(db.engine)
+    app = None
+    if not args.url:
+        from app.main import app, worker_pool
+        worker_pool.start()
+
+    print("API...", file=sys.stderr)
+    calls_before = stub.requests
+    report["cenarios"].update(asyncio.run(run_api(args, app, api_counter)))
+    if not args.url:
+        drained, pending = wait_jobs(args.jobs_timeout)
+        # enriquecimento em lote: bem menos de uma chamada ao LLM por startup criada
+        llm_calls = stub.requests - calls_before
+        report["cenarios"]["post_startups"].update(
+            drenagem_jobs_segundos=drained, jobs_pendentes=pending, chamadas_llm=llm_calls,
+            chamadas_llm_por_startup=round(llm_calls / args.posts, 3) if args.posts else None,
+        )
+        worker_pool.stop()
+
+    if not args.skip_etl:
+        print("ETL...", file=sys.stderr)
+        report["cenarios"].update(run_etl(args, stub_url, etl_counter))
+
+    report["stub"] = {"requisicoes": stub.requests, "erros_simulados": stub.errors}
+    report["rss_pico_mb"] = peak_rss_mb()
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["variacao_pct"] = compare(report["cenarios"], json.load(f)["cenarios"])
+    server.shutdown()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Popula o banco de DATABASE_URL com startups sintéticas para benchmarks.
+
+Uso (dentro de backend/):  python -m bench.seed 100000 [--reset]
+Passa pelo mesmo upsert em lote da API, então stats e vínculos com
+investidores ficam consistentes.
+"""
+import argparse
+import random
+import time
+from datetime import date
+from sqlalchemy import delete
+from app import crud, search
+from app.db import SessionLocal, engine
+from app.models import Base, Investidor, Startup, StartupInvestidor, StartupStat, DataVersion
+from bench.stub_perplexity import CO_INVESTIDORES, PAISES, RODADAS, SETORES, VALORES
+
+SEED_BATCH = 10_000
+VCS = ["Kaszek", "Monashees", "Softbank LatAm", "Astella Investimentos", "Valor Capital Group", "Bossanova",
+       "Angel Ventures", "Crescera Capital", "QED Investors"]
+
+
+def synthetic_rows(n, start=0, seed=42):
+    rnd = random.Random(seed + start)
+    for i in range(start, start + n):
+        vcs = dict.fromkeys([rnd.choice(VCS)] + ([rnd.choice(CO_INVESTIDORES)] if rnd.random() < 0.3 else []))
+        yield {
+            "nome": f"Bench Startup {i}",
+            "site": f"www.bench{i}.com",
+            "setor": rnd.choice(SETORES),
+            "ano_fundacao": rnd.randint(2005, 2023),
+            "valor_investimento": rnd.choice(VALORES),
+            "rodada": rnd.choice(RODADAS),
+            "data_investimento": date(rnd.randint(2015, 2025), rnd.randint(1, 12), rnd.randint(1, 28)),
+            "vc_investidor": ", ".join(vcs),
+            "descricao_breve": "Plataforma digital para pequenas empresas",
+            "linkedin_fundador": f"linkedin.com/in/bench{i}",
+            "localizacao": rnd.choice(PAISES),
+        }
+
+
+def reset(session):
+    for model in (StartupInvestidor, Investidor, StartupStat, DataVersion, Startup):
+        session.execute(delete(model))
+    session.commit()
+
+
+def seed(n, do_reset=False, batch=SEED_BATCH, start=0):
+    """Grava `n` startups em lotes, numeradas a partir de `start`; retorna linhas/s"""
+    Base.metadata.create_all(bind=engine)
+    search.ensure_search_index(engine)
+    session = SessionLocal()
+    try:
+        if do_reset:
+            reset(session)
+        began = time.perf_counter()
+        for offset in range(0, n, batch):
+            crud.bulk_upsert_startups(session, list(synthetic_rows(min(batch, n - offset), start + offset)))
+        elapsed = time.perf_counter() - began
+    finally:
+        session.close()
+    return n / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", type=int, nargs="?", default=1000)
+    parser.add_argument("--reset", action="store_true", help="apaga startups e derivados antes")
+    args = parser.parse_args()
+    rate = seed(args.rows, args.reset)
+    print(f"{args.rows} startups gravadas ({rate:.0f} linhas/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Servidor falso da API Perplexity para benchmarks e testes locais, sem custo de tokens.
+
+Responde a POST /chat/completions com um CSV sintético no formato pedido pelo
+prompt, com latência e taxa de erro configuráveis. Prompts de enriquecimento
+(lista "Startups:") recebem uma linha por nome, às vezes com o nome levemente
+diferente, como um LLM real.
+
+Uso (dentro de backend/):
+    python -m bench.stub_perplexity --port 8001 --latency 0.5 --jitter 0.2 --error-rate 0.05
+e aponte PERPLEXY_URL=http://localhost:8001/chat/completions.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HEADER = (
+    "Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; "
+    "Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)"
+)
+SETORES = ["Fintech", "Healthtech", "Edtech", "Agtech", "Proptech", "Logtech"]
+RODADAS = ["Seed", "Série A", "Série B", "Série C"]
+VALORES = ["5.000.000", "R$ 2,5 mi", "US$ 10M", "12.000.000", "Desconhecido"]
+PAISES = ["Brasil", "México", "Colômbia", "Argentina", "Chile"]
+CO_INVESTIDORES = ["QED Investors", "Monashees", "Kaszek", "Softbank LatAm", "Valor Capital Group"]
+
+_VC = re.compile(r"pelo VC (.+?) em formato CSV")
+_NOMES = re.compile(r"^\s*- (.+)$", re.MULTILINE)
+
+
+def startup_line(i, vc, rnd):
+    vcs = [vc] + ([rnd.choice(CO_INVESTIDORES)] if rnd.random() < 0.3 else [])
+    slug = re.sub(r"\W+", "", vc.lower())
+    return "; ".join([
+        f"{vc} Startup {i}", f"www.{slug}{i}.com", rnd.choice(SETORES), str(rnd.randint(2005, 2023)),
+        rnd.choice(VALORES), rnd.choice(RODADAS),
+        f"{rnd.randint(2015, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        ", ".join(dict.fromkeys(vcs)), "Plataforma digital para pequenas empresas",
+        f"linkedin.com/in/fundador-{slug}-{i}", rnd.choice(PAISES),
+    ])
+
+
+def csv_for(vc, rows, seed=0):
+    # mesma semente por VC: respostas repetidas são idênticas, como um upstream estável
+    rnd = random.Random(f"{seed}:{vc}")
+    return "\n".join([HEADER] + [startup_line(i, vc, rnd) for i in range(rows)])
+
+
+def csv_for_names(names, seed=0):
+    lines = [HEADER]
+    for name in names:
+        rnd = random.Random(f"{seed}:{name}")
+        line = startup_line(0, rnd.choice(CO_INVESTIDORES), rnd).split("; ")
+        # variações que o casamento aproximado precisa tolerar
+        line[0] = rnd.choice([name, name, name.upper(), f"{name} Ltda", f"{name} S.A."])
+        lines.append("; ".join(line))
+    return "\n".join(lines)
+
+
+class StubConfig:
+    def __init__(self, latency=0.5, jitter=0.0, error_rate=0.0, rows=10, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rows = rows
+        self.seed = seed
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def count(self, error):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            time.sleep(max(0.0, config.latency + random.uniform(-config.jitter, config.jitter)))
+            if random.random() < config.error_rate:
+                config.count(error=True)
+                self._send(random.choice([429, 500, 503]), {"error": "stub: falha simulada"})
+                return
+            config.count(error=False)
+            prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+            if "Startups:" in prompt:
+                names = _NOMES.findall(prompt.split("Startups:", 1)[1])
+                content = csv_for_names([n.strip() for n in names], config.seed)
+            else:
+                match = _VC.search(prompt)
+                content = csv_for(match.group(1).strip() if match else "Stub VC", config.rows, config.seed)
+            self._send(200, {
+                "id": "stub",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4},
+            })
+
+    return Handler
+
+
+def start(port=0, **kwargs):
+    """Sobe o stub numa thread; retorna (server, config, url). `port=0` escolhe uma porta livre"""
+    config = StubConfig(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-perplexity", daemon=True).start()
+    return server, config, f"http://127.0.0.1:{server.server_address[1]}/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="segundos por resposta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação uniforme ± na latência")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 429/5xx")
+    parser.add_argument("--rows", type=int, default=10, help="startups por resposta")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server, _, url = start(args.port, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, rows=args.rows, seed=args.seed)
+    print(f"Stub Perplexity em {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import metrics
+
+# Configuração do crawl concorrente (pode ser sobrescrita via .env)
+MAX_CONCURRENCY = int(os.getenv("ETL_MAX_CONCURRENCY", "5"))
+RATE_PER_HOST = float(os.getenv("ETL_RATE_PER_HOST", "2"))  # requisições/segundo por host
+MAX_RETRIES = int(os.getenv("ETL_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("ETL_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("ETL_BACKOFF_MAX", "20.0"))
+REQUEST_TIMEOUT = float(os.getenv("ETL_REQUEST_TIMEOUT", "60"))
+BUDGET_PER_KEY = float(os.getenv("ETL_BUDGET_PER_VC", "120"))
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """Espaça as requisições para um mesmo host em no máximo `rate` por segundo"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = {}
+        self._locks = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Backoff exponencial com jitter completo; respeita Retry-After quando presente"""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class AsyncFetcher:
+    """Dispara vários POSTs em paralelo contra o mesmo endpoint.
+
+    Cada chave (ex.: um VC) tem seu próprio orçamento de tempo, que cobre todas
+    as tentativas. Falhas definitivas viram None no resultado em vez de derrubar
+    o crawl inteiro. Com `cache`, respostas já conhecidas não vão ao upstream;
+    `upstream` guarda as chaves respondidas de fato pelo upstream.
+    """
+
+    def __init__(self, url, headers=None, concurrency=MAX_CONCURRENCY, rate_per_host=RATE_PER_HOST,
+                 max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT, budget=BUDGET_PER_KEY, transport=None,
+                 cache=None):
+        self.url = url
+        self.headers = headers or {}
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.budget = budget
+        self.transport = transport
+        self.cache = cache
+        self.upstream = set()
+        self.limiter = HostRateLimiter(rate_per_host)
+        self.host = urlsplit(url).netloc
+
+    async def _post(self, client, sem, key, payload):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.wait(self.host)
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    r = await client.post(self.url, json=payload, headers=self.headers)
+                except httpx.TransportError as e:
+                    print(f"Erro de rede ({key}):", e)
+                    r = None
+                elapsed = time.perf_counter() - start
+            if r is not None and r.status_code == 200:
+                try:
+                    data = r.json()
+                except ValueError:
+                    # 200 com HTML de proxy/gateway: falha só desta chave, não do crawl
+                    metrics.record_llm_call("etl", elapsed, "resposta_invalida")
+                    print(f"Resposta não JSON ({key}):", r.text[:200])
+                    return None
+                metrics.record_llm_call("etl", elapsed, 200, data)
+                self.upstream.add(key)
+                return data
+            metrics.record_llm_call("etl", elapsed, r.status_code if r is not None else "erro_rede")
+            if r is not None and r.status_code not in RETRY_STATUS:
+                print("Erro Perplexy:", key, r.status_code, r.text)
+                return None
+            if attempt == self.max_retries:
+                break
+            retry_after = r.headers.get("Retry-After") if r is not None else None
+            metrics.llm_retries.inc("etl")
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        print(f"Desistindo de {key} após {self.max_retries + 1} tentativas")
+        return None
+
+    async def _fetch_one(self, client, sem, key, payload):
+        if self.cache is not None:
+            return await self.cache.aget_or_fetch(payload, lambda: self._fetch_budgeted(client, sem, key, payload))
+        return await self._fetch_budgeted(client, sem, key, payload)
+
+    async def _fetch_budgeted(self, client, sem, key, payload):
+        try:
+            return await asyncio.wait_for(self._post(client, sem, key, payload), timeout=self.budget)
+        except asyncio.TimeoutError:
+            print(f"Orçamento de tempo esgotado para {key} ({self.budget}s)")
+            return None
+
+    async def fetch_all(self, payloads):
+        """Recebe {chave: payload} e devolve {chave: json da resposta ou None}"""
+        sem = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits, transport=self.transport) as client:
+            keys = list(payloads)
+            results = await asyncio.gather(*(self._fetch_one(client, sem, k, payloads[k]) for k in keys))
+        return dict(zip(keys, results))
@@ -1,30 +1,60 @@
-import httpx, io, csv
+import asyncio
+import json
+import sys
+import time
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from app import enrichment, metrics
 from app.db import get_session
-from app.models import Startup
+from app.crud import bulk_upsert_startups, upsert_changed_startups
+from app.llm_cache import llm_cache
+from app.llm_csv import parse_startups_csv
+from app.models import CsvQuarentena, EtlRun, EtlWatermark
+from etl.async_fetch import AsyncFetcher
 
 # Load environment variables from .env file
 load_dotenv()
 
 vc = ["Kaszek", "Monashees", "Softbank LatAm", "Astella Investimentos", "Valor Capital Group", "Bossanova", "Angel Ventures", "Crescera Capital", "QED Investors"]
 
+# Janela em que um VC buscado com sucesso não é buscado de novo
+ETL_VC_REFRESH_HOURS = float(os.getenv("ETL_VC_REFRESH_HOURS", "20"))
+
+def parse_refresh_overrides(value):
+    """'Kaszek=6,QED Investors=48' -> {'Kaszek': 6.0, 'QED Investors': 48.0}"""
+    overrides = {}
+    for item in (value or "").split(","):
+        name, sep, hours = item.rpartition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            overrides[name.strip()] = float(hours)
+        except ValueError:
+            print("ETL_VC_REFRESH inválido, ignorando:", item)
+    return overrides
+
+# Janelas por VC: VCs "quentes" podem ser buscados com mais frequência que o padrão
+ETL_VC_REFRESH = parse_refresh_overrides(os.getenv("ETL_VC_REFRESH"))
+
 PERPLEXY_KEY = os.getenv("PERPLEXY_API_KEY")
-PERPLEXY_URL = "https://api.perplexity.ai/chat/completions"
+PERPLEXY_URL = os.getenv("PERPLEXY_URL", "https://api.perplexity.ai/chat/completions")
 HEADERS = {
     "Authorization": f"Bearer {PERPLEXY_KEY}",
     "Content-Type": "application/json"
 }
 
-def parse_int(value):
-    """Converte para int, retorna None se vazio ou inválido"""
-    if value and value.strip().isdigit():
-        return int(value.strip())
-    return None
-
 def fetch_startup_data(nome: str):
-    payload = {
+    # Mesmo prompt em lote do enriquecimento da API, com um único nome
+    try:
+        rows = enrichment.fetch_batch([nome], PERPLEXY_URL, HEADERS)
+        return enrichment.match_rows([nome], rows).get(nome, {})
+    except Exception as e:
+        print("Erro ao buscar dados da API:", e)
+        return {}
+
+def build_payload(vc):
+    return {
     "model": "sonar-pro",
     "messages": [
         {"role": "system", "content": "Você é um assistente especializado em fornecer dados estruturados de startups."},
@@ -51,123 +81,164 @@ def fetch_startup_data(nome: str):
     ]
     }
 
-    try:
-        r = httpx.post(PERPLEXY_URL, json=payload, headers=HEADERS, timeout=60)
-        if r.status_code != 200:
-            print("Erro Perplexy:", r.status_code, r.text)
-            return {}
-
-        data = r.json()
-        csv_text = data["choices"][0]["message"]["content"]
-        csv_text = csv_text.replace("```csv", "").replace("```", "").strip()
-        reader = csv.DictReader(io.StringIO(csv_text), delimiter=';')
-        rows = list(reader)
-        if not rows:
-            return {}
-
-        row = rows[0]
-        # Campos tratados
-        ano_fundacao = parse_int(row.get("Ano de Fundação"))
-        valor_investimento = row.get("Valor do Investimento (em reais)")
-        data_investimento = row.get("Data do Investimento")
-       
-
-        # Retorna dicionário pronto
-        return {
-            "nome": row.get("Nome da Startup") or nome,
-            "site": row.get("Site"),
-            "setor": row.get("Setor"),
-            "ano_fundacao": ano_fundacao,
-            "valor_investimento": valor_investimento.strip() if valor_investimento else None,
-            "rodada": row.get("Rodada"),
-            "data_investimento": data_investimento.strip() if data_investimento else None,
-            "vc_investidor": row.get("VC Investidor"),
-            "descricao_breve": row.get("Descrição Breve"),
-            "linkedin_fundador": row.get("LinkedIn do Fundador"),
-            "localizacao": row.get("Localização (país)")
-        }
+def parse_vc_response(vc, data):
+    return parse_startups_csv(data["choices"][0]["message"]["content"], default_vc=vc)
+
+async def fetch_by_vc_async(vcs, fetcher=None):
+    """Busca todos os VCs em paralelo; o tempo total fica próximo ao da chamada mais lenta.
+
+    Retorna {vc: ParseResult}, com None para os VCs cuja busca ou leitura falhou.
+    """
+    fetcher = fetcher or AsyncFetcher(PERPLEXY_URL, headers=HEADERS, cache=llm_cache)
+    responses = await fetcher.fetch_all({vc: build_payload(vc) for vc in vcs})
+    results = {}
+    for vc in vcs:
+        data = responses.get(vc)
+        results[vc] = None
+        if data is None:
+            continue
+        start = time.perf_counter()
+        try:
+            results[vc] = parse_vc_response(vc, data)
+        except Exception as e:
+            print("Erro ao processar resposta de", vc, e)
+        metrics.etl_stages.observe(time.perf_counter() - start, "parse")
+    return results
 
-    except Exception as e:
-        print("Erro ao buscar dados da API:", e)
-        return {}
+async def fetch_startups_async(vcs, fetcher=None):
+    by_vc = await fetch_by_vc_async(vcs, fetcher)
+    return [row for vc in vcs if by_vc[vc] for row in by_vc[vc].rows]
 
 def fetch_startups(vcs):
-    results = []
-    with httpx.Client(timeout=60.0) as client:
-        for vc in vcs:
-            payload = {
-                   "model": "sonar-pro",
-    "messages": [
-        {"role": "system", "content": "Você é um assistente especializado em fornecer dados estruturados de startups."},
-        {"role": "user", "content": f"""
-        Liste exatamente 10 startups investidas pelo VC {vc} em formato CSV.
-
-        As colunas devem ser exatamente nesta ordem:
-        Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)
+    return asyncio.run(fetch_startups_async(vcs))
 
-        Regras:
-        - Nunca deixe nenhum campo vazio. Se não houver informação, escreva 'Desconhecido'.
-        - Use sempre ponto e vírgula (;) como separador de colunas.
-        - Retorne apenas a tabela em CSV puro, sem markdown, sem cabeçalho extra e sem comentários.
-        - A tabela deve conter exatamente 11 linhas: 1 cabeçalho + 10 startups.
-
-        Exemplo de formato esperado (apenas ilustrativo, substitua pelos dados corretos):
-
-        Nome da Startup; Site; Setor; Ano de Fundação; Valor do Investimento (em reais); Rodada; Data do Investimento; VC Investidor; Descrição Breve; LinkedIn do Fundador; Localização (país)
-        Startup A; www.startupa.com; Fintech; 2018; 5.000.000; Série A; 2021-06-15; {vc}; Plataforma de pagamentos digitais; linkedin.com/in/fundadorA; Brasil
-        Startup B; www.startupb.com; Healthtech; 2019; 2.500.000; Seed; 2020-11-20; {vc}; App de consultas médicas; linkedin.com/in/fundadorB; EUA
-        ...
-        Startup J; www.startupj.com; Edtech; 2017; 8.000.000; Série B; 2022-05-10; {vc}; Plataforma de ensino online; linkedin.com/in/fundadorJ; Canadá
-        """}
-                ]
-            }
-
-            r = client.post(PERPLEXY_URL, json=payload, headers=HEADERS)
-            if r.status_code != 200:
-                print("Erro Perplexy:", r.status_code, r.text)
-                continue
+def upsert_startups(items):
+    session = get_session()
+    try:
+        return bulk_upsert_startups(session, items)
+    finally:
+        session.close()
 
-            data = r.json()
-            csv_text = data["choices"][0]["message"]["content"]
-            csv_text = csv_text.replace("```csv", "").replace("```", "").strip()
-            reader = csv.DictReader(io.StringIO(csv_text), delimiter=';')
-
-            for it in reader:
-                results.append({
-                    "nome": it.get("Nome da Startup"),
-                    "site": it.get("Site"),
-                    "setor": it.get("Setor"),
-                    "ano_fundacao": parse_int(it.get("Ano de Fundação")),
-                    "valor_investimento": it.get("Valor do Investimento (em reais)").strip() if it.get("Valor do Investimento (em reais)") else None,
-                    "rodada": it.get("Rodada"),
-                    "data_investimento": it.get("Data do Investimento").strip() if it.get("Data do Investimento") else None,
-                    "vc_investidor": it.get("VC Investidor") or vc,
-                    "descricao_breve": it.get("Descrição Breve"),
-                    "linkedin_fundador": it.get("LinkedIn do Fundador"),
-                    "localizacao": it.get("localizacao")
-                })
-    return results
+def save_quarantine(session, origem, items):
+    now = datetime.utcnow()
+    for q in items:
+        print("Linha rejeitada:", origem, q["linha"], q["motivo"])
+        session.add(CsvQuarentena(origem=origem, criado_em=now, **q))
+
+def due_vcs(session, vcs, now=None, refresh_hours=ETL_VC_REFRESH_HOURS, overrides=None):
+    """VCs sem busca bem-sucedida dentro da sua janela de refresh"""
+    now = now or datetime.utcnow()
+    overrides = ETL_VC_REFRESH if overrides is None else overrides
+    marks = {m.vc: m.ultimo_fetch for m in session.query(EtlWatermark).filter(EtlWatermark.vc.in_(vcs))}
+    return [
+        v for v in vcs
+        if marks.get(v) is None or marks[v] <= now - timedelta(hours=overrides.get(v, refresh_hours))
+    ]
 
-def upsert_startups(items):
+def take_over_interrupted(session):
+    """VCs deixados pelo último run, se ele caiu ('executando') ou parou com erro.
+
+    Runs que ficaram 'executando' passam a 'interrompido'. Retorna (id do run
+    retomado ou None, VCs pendentes). Só deve ser chamado por quem detém a
+    trava do ETL.
+    """
+    stale = session.query(EtlRun).filter(EtlRun.status == "executando").all()
+    for r in stale:
+        r.status = "interrompido"
+    session.commit()
+    last = session.query(EtlRun).order_by(EtlRun.id.desc()).first()
+    if last is None or last.status not in ("interrompido", "erro") or not last.pendentes:
+        return None, []
+    return last.id, json.loads(last.pendentes)
+
+def run_incremental(vcs, force=False, fetcher=None, checkpoint=None):
+    """Executa o ETL só para VCs vencidos, gravando só o que mudou, e registra o run em etl_runs.
+
+    Cada VC gravado é um checkpoint: o run guarda em `pendentes` o que falta,
+    e um run interrompido é retomado pelo seguinte em vez de recomeçar.
+    `checkpoint()` é chamado após cada VC (ex.: renovar a trava); se retornar
+    False o run para.
+    """
     session = get_session()
+    resumed_from, leftover = take_over_interrupted(session)
+    run = EtlRun(iniciado_em=datetime.utcnow(), status="executando", vcs_buscados=0, vcs_pulados=0,
+                 fetched=0, inserted=0, updated=0, unchanged=0, failed=0, quarentena=0, retomado_de=resumed_from)
+    session.add(run)
+    session.commit()
+    # segundos por etapa; também vão para etl_stage_duration_seconds em /metrics
+    etapas = {"planejamento": 0.0, "busca": 0.0, "gravacao": 0.0, "total": 0.0}
+    started = time.perf_counter()
+
+    def timed(etapa, start):
+        elapsed = time.perf_counter() - start
+        etapas[etapa] += elapsed
+        metrics.etl_stages.observe(elapsed, etapa)
+
     try:
-        for it in items:
-            # Verifica se já existe startup com mesmo nome
-            q = session.query(Startup).filter(Startup.nome == it['nome']).first()
-            if q:
-                # Atualiza campos existentes
-                for k, v in it.items():
-                    if v is not None:
-                        setattr(q, k, v)
-                q.atualizado_em = datetime.utcnow()
-            else:
-                s = Startup(**it, atualizado_em=datetime.utcnow())
-                session.add(s)
+        start = time.perf_counter()
+        pending = list(vcs) if force else due_vcs(session, vcs)
+        # VCs que o run interrompido não chegou a gravar entram mesmo fora da janela
+        pending += [v for v in vcs if v in leftover and v not in pending]
+        run.pendentes = json.dumps(pending, ensure_ascii=False)
         session.commit()
+        remaining = list(pending)
+        timed("planejamento", start)
+        run.vcs_pulados = len(vcs) - len(pending)
+        run.vcs_buscados = len(pending)
+        start = time.perf_counter()
+        # sem o cache do LLM: a janela de refresh (ou --force) já decidiu que o VC
+        # deve ir ao upstream, e o TTL do cache costuma ser maior que a janela
+        fetcher = fetcher or AsyncFetcher(PERPLEXY_URL, headers=HEADERS)
+        by_vc = asyncio.run(fetch_by_vc_async(pending, fetcher))
+        timed("busca", start)
+        for vc_name in pending:
+            parsed = by_vc.get(vc_name)
+            if parsed is None:
+                run.failed += 1
+                continue
+            start = time.perf_counter()
+            rows = parsed.rows
+            save_quarantine(session, vc_name, parsed.quarantine)
+            run.quarentena += len(parsed.quarantine)
+            counts = upsert_changed_startups(session, rows, commit=False)
+            run.fetched += len(rows)
+            run.inserted += counts["inserted"]
+            run.updated += counts["updated"]
+            run.unchanged += counts["unchanged"]
+            if vc_name in fetcher.upstream:
+                # resposta vinda de cache (fetcher com cache) não conta como busca
+                session.merge(EtlWatermark(vc=vc_name, ultimo_fetch=datetime.utcnow(), linhas=len(rows)))
+            remaining.remove(vc_name)
+            run.pendentes = json.dumps(remaining, ensure_ascii=False)
+            # commit por VC: uma falha adiante não desfaz o que já foi gravado
+            session.commit()
+            timed("gravacao", start)
+            if checkpoint is not None and checkpoint() is False:
+                raise RuntimeError("trava do ETL perdida; o próximo run retoma os VCs pendentes")
+        run.status = "concluido"
+    except Exception as e:
+        session.rollback()
+        print("Erro no ETL:", e)
+        run.status = "erro"
+        run.erro = str(e)
     finally:
+        run.finalizado_em = datetime.utcnow()
+        session.commit()
+        result = {c.name: getattr(run, c.name) for c in EtlRun.__table__.columns}
         session.close()
+        timed("total", started)
+        result["etapas"] = {k: round(v, 3) for k, v in etapas.items()}
+    return result
 
 if __name__ == '__main__':
-    startups = fetch_startups(vc)
-    upsert_startups(startups)
-    print(f"Importadas {len(startups)} startups.")
\ No newline at end of file
+    from etl.scheduler import run_locked
+
+    result = run_locked(vc, force="--force" in sys.argv)
+    if result is None:
+        sys.exit(1)
+    print(
+        f"Run {result['id']} ({result['status']}): {result['fetched']} buscadas, {result['inserted']} inseridas, "
+        f"{result['updated']} atualizadas, {result['unchanged']} sem mudança, {result['failed']} VCs com falha, "
+        f"{result['vcs_pulados']} VCs pulados, {result['quarentena']} linhas em quarentena."
+    )
+    print("Tempo por etapa (s):", ", ".join(f"{k}={v}" for k, v in result["etapas"].items()))
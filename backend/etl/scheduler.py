@@ -0,0 +1,115 @@
+"""Agendador do ETL: roda run_incremental periodicamente, um processo por vez.
+
+Uso (dentro de backend/):
+    python -m etl.scheduler            # loop; a cada ETL_SCHEDULE_INTERVAL_MINUTES busca os VCs vencidos
+    python -m etl.scheduler --once     # uma execução (ex.: via cron)
+
+A trava fica no banco (etl_locks), então vale entre processos e máquinas. Se
+o dono morrer sem liberar, ela expira após ETL_LOCK_TTL_MINUTES.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from app.db import get_session
+from app.models import EtlLock
+from etl.fetch_and_load import run_incremental, vc
+
+ETL_SCHEDULE_INTERVAL_MINUTES = float(os.getenv("ETL_SCHEDULE_INTERVAL_MINUTES", "30"))
+ETL_LOCK_TTL_MINUTES = float(os.getenv("ETL_LOCK_TTL_MINUTES", "30"))
+
+LOCK_NAME = "etl"
+
+
+def new_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lock(session, owner, ttl_minutes=ETL_LOCK_TTL_MINUTES, nome=LOCK_NAME):
+    """Tenta pegar a trava; True se conseguiu. Trava expirada pode ser tomada"""
+    now = datetime.utcnow()
+    expires = now + timedelta(minutes=ttl_minutes)
+    taken = session.execute(
+        update(EtlLock)
+        .where(EtlLock.nome == nome, or_(EtlLock.expira_em < now, EtlLock.dono == owner))
+        .values(dono=owner, adquirido_em=now, expira_em=expires)
+    )
+    session.commit()
+    if taken.rowcount == 1:
+        return True
+    session.add(EtlLock(nome=nome, dono=owner, adquirido_em=now, expira_em=expires))
+    try:
+        session.commit()
+        return True
+    except IntegrityError:
+        # já existe e ainda é válida: outro processo está rodando
+        session.rollback()
+        return False
+
+
+def renew_lock(session, owner, ttl_minutes=ETL_LOCK_TTL_MINUTES, nome=LOCK_NAME):
+    """Estende a validade; False se a trava não é mais deste dono"""
+    renewed = session.execute(
+        update(EtlLock)
+        .where(EtlLock.nome == nome, EtlLock.dono == owner)
+        .values(expira_em=datetime.utcnow() + timedelta(minutes=ttl_minutes))
+    )
+    session.commit()
+    return renewed.rowcount == 1
+
+
+def release_lock(session, owner, nome=LOCK_NAME):
+    session.execute(delete(EtlLock).where(EtlLock.nome == nome, EtlLock.dono == owner))
+    session.commit()
+
+
+def run_locked(vcs, force=False, fetcher=None):
+    """run_incremental sob a trava; None se outro processo já está rodando o ETL"""
+    owner = new_owner()
+    session = get_session()
+    try:
+        if not acquire_lock(session, owner):
+            print("ETL já em execução em outro processo; pulando.")
+            return None
+        try:
+            return run_incremental(vcs, force=force, fetcher=fetcher, checkpoint=lambda: renew_lock(session, owner))
+        finally:
+            release_lock(session, owner)
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="executa uma vez e sai")
+    parser.add_argument("--force", action="store_true", help="busca todos os VCs, ignorando as janelas de refresh")
+    parser.add_argument("--interval", type=float, default=ETL_SCHEDULE_INTERVAL_MINUTES, help="minutos entre execuções")
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    while not stop.is_set():
+        try:
+            result = run_locked(vc, force=args.force)
+            if result is not None:
+                print(
+                    f"Run {result['id']} ({result['status']}): {result['vcs_buscados']} VCs buscados, "
+                    f"{result['vcs_pulados']} pulados, {result['inserted']} inseridas, {result['updated']} atualizadas."
+                )
+        except Exception as e:
+            # erro de conexão etc.: o loop continua e tenta de novo no próximo ciclo
+            print("Erro no agendador do ETL:", e)
+        if args.once:
+            break
+        stop.wait(args.interval * 60)
+
+
+if __name__ == "__main__":
+    main()
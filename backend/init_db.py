@@ -1,19 +1,80 @@
-from app.db import engine
-from app.models import Base
-from apscheduler.schedulers.background import BackgroundScheduler
-from fetch_data import fetch_and_save
+from datetime import datetime
+from sqlalchemy import delete, func, inspect, select, text
+from app.db import engine, SessionLocal
+from app import crud, investidores, search, stats, valores, versao
+from app.llm_csv import is_placeholder
+from app.models import Base, Startup, StartupInvestidor
+
+def ensure_indexes():
+    # create_all não cria índices novos em tabelas que já existem
+    for table in Base.metadata.sorted_tables:
+        for idx in table.indexes:
+            idx.create(bind=engine, checkfirst=True)
+
+def ensure_columns():
+    # create_all também não adiciona colunas novas; cobre as que vieram depois da tabela
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                with engine.begin() as conn:
+                    conn.execute(text(ddl))
+
+def dedupe_startups():
+    # Bancos antigos podem ter o mesmo nome duas vezes (o upsert linha a linha
+    # inseria de novo a startup listada por dois VCs); ux_startups_nome não é
+    # criado enquanto houver repetidos. Funde cada grupo no menor id, com valores
+    # não nulos dos mais recentes vencendo (vc_investidor vira a união), e apaga o resto.
+    table = Startup.__table__
+    session = SessionLocal()
+    try:
+        nomes = session.execute(
+            select(table.c.nome).group_by(table.c.nome).having(func.count() > 1)
+        ).scalars().all()
+        removed = 0
+        for nome in nomes:
+            rows = [dict(r._mapping) for r in session.execute(select(table).where(table.c.nome == nome).order_by(table.c.id))]
+            keep = rows[0]
+            merged = dict(keep)
+            for row in rows[1:]:
+                merged.update({k: v for k, v in row.items() if k != "id" and not is_placeholder(v)})
+            # listada por dois VCs: os dois ficam
+            vcs = [v for row in rows for v in investidores.split_names(row.get("vc_investidor"))]
+            merged["vc_investidor"] = ", ".join(dict.fromkeys(vcs)) or merged.get("vc_investidor")
+            merged["valor_investimento_brl"] = valores.parse_valores([merged.get("valor_investimento")])[0]
+            merged["conteudo_hash"] = crud.row_hash(merged)
+            ids = [r["id"] for r in rows[1:]]
+            session.execute(delete(StartupInvestidor).where(StartupInvestidor.startup_id.in_(ids)))
+            session.execute(delete(table).where(table.c.id.in_(ids)))
+            session.execute(table.update().where(table.c.id == keep["id"]).values({k: v for k, v in merged.items() if k != "id"}))
+            removed += len(ids)
+        if removed:
+            versao.bump(session, datetime.utcnow())
+        session.commit()
+    finally:
+        session.close()
+    if removed:
+        print(f"{removed} startups repetidas fundidas em {len(nomes)} nomes.")
+    return removed
 
 def init():
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    dedupe_startups()
+    ensure_indexes()
+    search.ensure_search_index(engine)
+    # Preenche colunas derivadas, startup_stats e startup_investidores a partir dos dados existentes
+    session = SessionLocal()
+    try:
+        valores.backfill(session)
+        stats.rebuild(session)
+        investidores.backfill(session)
+    finally:
+        session.close()
 if __name__ == '__main__':
     init()
     print('DB initialized')
-
-
-
-scheduler = BackgroundScheduler()
-# todo dia às 7h
-scheduler.add_job(fetch_and_save, 'cron', hour=7, minute=0)
-scheduler.start()
-
-# seu backend continua rodando normalmente